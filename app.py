@@ -5,12 +5,14 @@ from loguru import logger
 from pathlib import Path
 import yaml
 from fastapi import FastAPI, HTTPException, Request, UploadFile, File
-from fastapi.responses import HTMLResponse, FileResponse, JSONResponse
+from fastapi.responses import HTMLResponse, FileResponse, JSONResponse, ORJSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 import uvicorn
 from pydantic import BaseModel
 from contextlib import asynccontextmanager
+import asyncio
+import orjson
 
 # Import new chat models and services
 from models.chat import (
@@ -19,7 +21,10 @@ from models.chat import (
 )
 from services.chat_service import ChatService
 from services.rag_service import RAGService
-from services.ollama_service import generate_answer_with_ollama
+from services.ollama_service import (
+    generate_answer_with_ollama, generate_answer_with_ollama_async,
+    stream_answer_with_ollama, score_streamed_answer
+)
 
 # Configuration
 CONFIG_PATH = Path("config.yaml")
@@ -40,10 +45,13 @@ def load_config():
 
 config = load_config()
 
-# Initialize services
+# Initialize services (models and indexes are loaded once here and reused by every request)
 rag_service = RAGService(config)
 chat_service = ChatService(rag_service=rag_service)
 
+# Serializes reindex runs so only one rebuild swaps in new indexes at a time
+reindex_lock = asyncio.Lock()
+
 def clean_frontend_formatting(content: str) -> str:
     """Generic text cleaning for frontend display - merges content that belongs to same numbered step"""
     if not content:
@@ -197,10 +205,21 @@ def clean_frontend_formatting(content: str) -> str:
 
 console = Console()
 
+CONTEXT_PREVIEW_CHARS = 1000
+
+def _context_preview(text: str) -> str:
+    """Truncate chunk text for the /ask context payload, copying only when it is too long"""
+    if len(text) <= CONTEXT_PREVIEW_CHARS:
+        return text
+    return text[:CONTEXT_PREVIEW_CHARS] + "..."
+
 # Pydantic models
 class QueryRequest(BaseModel):
     query: str
 
+class BatchQueryRequest(BaseModel):
+    queries: List[str]
+
 class QueryResponse(BaseModel):
     answer: str
     context: List[Dict[str, Any]]
@@ -208,8 +227,6 @@ class QueryResponse(BaseModel):
     confidence_score: float
     answer_validation: Dict[str, Any]
 
-# Use imported function from services/ollama_service.py instead of duplicating code
-
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Check for new PDFs and auto-index on startup"""
@@ -245,6 +262,7 @@ async def lifespan(app: FastAPI):
 app = FastAPI(
     title="AI Doc Assist API - Built with Microsoft Phi-3", 
     description="RAG system for document guides powered by Phi-3 (3.8B) under MIT License", 
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
@@ -368,87 +386,160 @@ async def root(request: Request):
     """Modern HTML interface for AI Doc Assist"""
     return templates.TemplateResponse("index.html", {"request": request})
 
+def _build_sources(retrieved_chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Build the deduplicated source citations for retrieved chunks"""
+    sources = []
+    sources_by_key = {}  # (filename, page_number) -> source entry
+    duplicate_count = 0  # Track how many duplicates were removed
+
+    for chunk in retrieved_chunks:
+        source_info = chunk['metadata']
+        # Convert document ID to actual PDF filename
+        document_id = source_info.get('filename', 'Unknown')
+        actual_pdf_filename = rag_service.get_pdf_filename_from_document_id(document_id)
+
+        page_number = source_info.get('page_number')
+        section_title = source_info.get('section_title')
+        relevance_score = source_info.get('relevance_score', 0.0)
+
+        # Create unique identifier for this source
+        source_key = (actual_pdf_filename, page_number)
+
+        # Skip if we've already seen this source
+        existing_source = sources_by_key.get(source_key)
+        if existing_source is None:
+            source_text = f"{actual_pdf_filename} (Page {page_number or 'N/A'})"
+            if section_title:
+                source_text += f" → Section: {section_title}"
+
+            sources_by_key[source_key] = {
+                'text': source_text,
+                'filename': actual_pdf_filename,
+                'page_number': page_number,
+                'section_title': section_title,
+                'relevance_score': relevance_score
+            }
+            sources.append(sources_by_key[source_key])
+        else:
+            duplicate_count += 1
+            # If duplicate, update the relevance score to the highest one
+            existing_source['relevance_score'] = max(
+                existing_source['relevance_score'] or 0.0,
+                relevance_score or 0.0
+            )
+
+    # Log deduplication info
+    if duplicate_count > 0:
+        logger.info(f"Deduplicated {duplicate_count} duplicate sources from {len(retrieved_chunks)} total chunks")
+    
+    return sources
+
+def _greeting_query_response(query: str):
+    """Canned QueryResponse for casual greetings, or None for real questions"""
+    greeting_response = chat_service._detect_greeting(query)
+    if not greeting_response:
+        return None
+    greeting_text = chat_service.default_responses.get(greeting_response, chat_service.default_responses['greeting'])
+    return QueryResponse(
+        answer=greeting_text,
+        context=[],
+        sources=[],
+        confidence_score=1.0,
+        answer_validation={"response_type": "greeting", "greeting_type": greeting_response}
+    )
+
+async def _answer_query(query: str, retrieved_chunks: List[Dict[str, Any]]) -> QueryResponse:
+    """Generate an answer for already-retrieved chunks and package it as a QueryResponse"""
+    answer, confidence_score, validation_result = await generate_answer_with_ollama_async(query, retrieved_chunks)
+
+    # Clean the answer for frontend display
+    answer = clean_frontend_formatting(answer)
+    
+    sources = _build_sources(retrieved_chunks)
+    
+    return QueryResponse(
+        answer=answer,
+        context=[{"text": _context_preview(chunk['text']), "metadata": chunk['metadata']} for chunk in retrieved_chunks],
+        sources=sources,
+        confidence_score=confidence_score,
+        answer_validation=validation_result
+    )
+
 @app.post("/ask", response_model=QueryResponse)
 async def ask_endpoint(request: QueryRequest):
     """API endpoint for asking questions"""
     try:
         # Check for casual greetings first
-        greeting_response = chat_service._detect_greeting(request.query)
-        if greeting_response:
-            greeting_text = chat_service.default_responses.get(greeting_response, chat_service.default_responses['greeting'])
-            return QueryResponse(
-                answer=greeting_text,
-                context=[],
-                sources=[],
-                confidence_score=1.0,
-                answer_validation={"response_type": "greeting", "greeting_type": greeting_response}
-            )
+        greeting = _greeting_query_response(request.query)
+        if greeting:
+            return greeting
         
-        retrieved_chunks = rag_service.search(request.query)
+        # Retrieval is CPU-bound; keep it off the event loop
+        retrieved_chunks = await asyncio.to_thread(rag_service.search, request.query)
         
-        answer, confidence_score, validation_result = generate_answer_with_ollama(request.query, retrieved_chunks)
+        return await _answer_query(request.query, retrieved_chunks)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        # Clean the answer for frontend display
-        answer = clean_frontend_formatting(answer)
+@app.post("/ask_batch", response_model=List[QueryResponse])
+async def ask_batch_endpoint(request: BatchQueryRequest):
+    """Answer several questions at once: one batched query encode, then concurrent generation"""
+    try:
+        responses = [_greeting_query_response(query) for query in request.queries]
+        pending = [i for i, response in enumerate(responses) if response is None]
         
-        sources = []
-        seen_sources = set()  # Track (filename, page_number) combinations
-        duplicate_count = 0  # Track how many duplicates were removed
-
-        for chunk in retrieved_chunks:
-            source_info = chunk['metadata']
-            # Convert document ID to actual PDF filename
-            document_id = source_info.get('filename', 'Unknown')
-            actual_pdf_filename = rag_service.get_pdf_filename_from_document_id(document_id)
-
-            page_number = source_info.get('page_number')
-            section_title = source_info.get('section_title')
-            relevance_score = source_info.get('relevance_score', 0.0)
-
-            # Create unique identifier for this source
-            source_key = (actual_pdf_filename, page_number)
-
-            # Skip if we've already seen this source
-            if source_key not in seen_sources:
-                seen_sources.add(source_key)
-
-                source_text = f"{actual_pdf_filename} (Page {page_number or 'N/A'})"
-                if section_title:
-                    source_text += f" → Section: {section_title}"
-
-                sources.append({
-                    'text': source_text,
-                    'filename': actual_pdf_filename,
-                    'page_number': page_number,
-                    'section_title': section_title,
-                    'relevance_score': relevance_score
-                })
-            else:
-                duplicate_count += 1
-                # If duplicate, update the relevance score to the highest one
-                for existing_source in sources:
-                    if (existing_source['filename'] == actual_pdf_filename and
-                        existing_source['page_number'] == page_number):
-                        existing_source['relevance_score'] = max(
-                            existing_source['relevance_score'] or 0.0,
-                            relevance_score or 0.0
-                        )
-                        break
-
-        # Log deduplication info
-        if duplicate_count > 0:
-            logger.info(f"Deduplicated {duplicate_count} duplicate sources from {len(retrieved_chunks)} total chunks")
+        pending_queries = [request.queries[i] for i in pending]
+        retrieved = await asyncio.to_thread(rag_service.search_batch, pending_queries)
         
-        return QueryResponse(
-            answer=answer,
-            context=[{"text": chunk['text'][:1000] + ("..." if len(chunk['text']) > 1000 else ""), "metadata": chunk['metadata']} for chunk in retrieved_chunks],
-            sources=sources,
-            confidence_score=confidence_score,
-            answer_validation=validation_result
-        )
+        answers = await asyncio.gather(*(_answer_query(query, chunks) for query, chunks in zip(pending_queries, retrieved)))
+        for i, answer in zip(pending, answers):
+            responses[i] = answer
+        
+        return responses
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _sse_event(event: str, data: Any) -> bytes:
+    """Encode one server-sent event"""
+    return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+
+@app.post("/ask/stream")
+async def ask_stream_endpoint(request: QueryRequest):
+    """Streaming variant of /ask: sources first, then answer tokens, then the scored final answer"""
+    greeting = _greeting_query_response(request.query)
+    
+    async def event_stream():
+        if greeting:
+            yield _sse_event("done", greeting.model_dump(include={"answer", "confidence_score", "answer_validation"}))
+            return
+        
+        try:
+            retrieved_chunks = await asyncio.to_thread(rag_service.search, request.query)
+            
+            # Citations are known before generation starts, so send them up front
+            yield _sse_event("sources", {
+                "sources": _build_sources(retrieved_chunks),
+                "context": [{"text": _context_preview(chunk['text']), "metadata": chunk['metadata']} for chunk in retrieved_chunks]
+            })
+            
+            tokens = []
+            async for token in stream_answer_with_ollama(request.query, retrieved_chunks):
+                tokens.append(token)
+                yield _sse_event("token", {"text": token})
+            
+            answer = ''.join(tokens)
+            confidence_score, validation_result = score_streamed_answer(request.query, answer, retrieved_chunks)
+            yield _sse_event("done", {
+                "answer": clean_frontend_formatting(answer),
+                "confidence_score": confidence_score,
+                "answer_validation": validation_result
+            })
+        except Exception as e:
+            logger.error(f"Streaming answer failed: {e}")
+            yield _sse_event("error", {"detail": str(e)})
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
 @app.get("/autocomplete")
 async def autocomplete_endpoint(query: str = ""):
     """Get autocomplete suggestions for section titles"""
@@ -461,6 +552,12 @@ async def autocomplete_endpoint(query: str = ""):
 @app.post("/reindex")
 async def reindex_endpoint(force: bool = False):
     """Reindex documents (incremental by default, force=true for full reindex)"""
+    async with reindex_lock:
+        # Rebuild off the event loop; queries keep using the current indexes until the swap
+        return await asyncio.to_thread(_run_reindex, force)
+
+def _run_reindex(force: bool):
+    """Run a reindex and build the /reindex response"""
     try:
         if force:
             results = rag_service.index_documents(force_reindex=True)
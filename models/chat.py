@@ -1,8 +1,14 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 from enum import Enum
 
+def _new_message_id() -> str:
+    return f"msg_{datetime.now().timestamp()}"
+
+def _new_session_id() -> str:
+    return f"session_{datetime.now().timestamp()}"
+
 class MessageRole(str, Enum):
     USER = "user"
     ASSISTANT = "assistant"
@@ -18,7 +24,9 @@ class Source(BaseModel):
 
 class ChatMessage(BaseModel):
     """Individual chat message"""
-    id: str = Field(default_factory=lambda: f"msg_{datetime.now().timestamp()}")
+    model_config = ConfigDict(extra='ignore')
+    
+    id: str = Field(default_factory=_new_message_id)
     role: MessageRole
     content: str
     timestamp: datetime = Field(default_factory=datetime.now)
@@ -27,7 +35,9 @@ class ChatMessage(BaseModel):
 
 class ChatSession(BaseModel):
     """Chat session containing multiple messages"""
-    session_id: str = Field(default_factory=lambda: f"session_{datetime.now().timestamp()}")
+    model_config = ConfigDict(extra='ignore')
+    
+    session_id: str = Field(default_factory=_new_session_id)
     title: Optional[str] = None
     messages: List[ChatMessage] = Field(default_factory=list)
     created_at: datetime = Field(default_factory=datetime.now)
@@ -41,7 +51,8 @@ class ChatSession(BaseModel):
         
         # Auto-generate title from first user message if not set
         if not self.title and message.role == MessageRole.USER:
-            self.title = message.content[:50] + "..." if len(message.content) > 50 else message.content
+            content = message.content
+            self.title = content if len(content) <= 50 else content[:50] + "..."
 
 class CreateSessionRequest(BaseModel):
     """Request to create a new chat session"""
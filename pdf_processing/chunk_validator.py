@@ -7,11 +7,68 @@ Cross-references font-based chunks with index structure and detects gaps
 import logging
 from typing import Dict, List, Any, Optional, Tuple, Set
 from dataclasses import dataclass
+from enum import IntEnum
 from difflib import SequenceMatcher
 import re
+import time
+from functools import lru_cache
+from collections import defaultdict
+
+# Import required libraries
+try:
+    import numpy as np
+except ImportError as e:
+    print(f"Missing required library: {e}")
+    print("Install with: pip install numpy")
+    raise
+
+# rapidfuzz's C++ Indel ratio is much faster than difflib; difflib remains the fallback
+try:
+    from rapidfuzz import fuzz, process
+except ImportError:
+    fuzz = None
+    process = None
 
 logger = logging.getLogger(__name__)
 
+# Upper bound on chunk x entry scores held in memory at once while matching
+_MAX_SCORE_CELLS = 1_000_000
+
+# Lines that end a recovered section: markdown headings, numbered headings, "Chapter N"
+_SECTION_HEADING_RE = re.compile(r'^\s*#+\s|^\s*\d+\.\s|^\s*chapter\s+\d+', re.IGNORECASE)
+
+# Title leader patterns, each paired with the run it needs so titles without one skip the regex
+_TITLE_CLEANUP_PATTERNS = [
+    (re.compile(r'\s*\.{3,}\s*\d+\s*$'), '...'),  # Remove dotted leaders and page numbers
+    (re.compile(r'\s*-{3,}\s*\d+\s*$'), '---'),   # Remove dashed leaders and page numbers
+]
+
+
+@lru_cache(maxsize=8192)
+def _clean_title(title: str) -> str:
+    """Clean title for better matching (cached: the same titles recur across chunks, entries and runs)"""
+    cleaned = title.strip()
+
+    # Remove leaders and page numbers
+    for pattern, leader in _TITLE_CLEANUP_PATTERNS:
+        if leader in cleaned:
+            cleaned = pattern.sub('', cleaned)
+
+    # Remove a bullet point
+    if cleaned[:1] in ('-', '•'):
+        cleaned = cleaned[1:]
+
+    # Normalize whitespace (split/join also strips both ends)
+    return ' '.join(cleaned.split()).lower()
+
+
+class MatchType(IntEnum):
+    """How a chunk matched its index entry; member names are the strings written to chunk metadata"""
+    exact = 0
+    partial = 1
+    inferred = 2
+
+
 @dataclass
 class ValidationResult:
     """Results of chunk validation"""
@@ -24,28 +81,39 @@ class ValidationResult:
 @dataclass
 class ChunkMatch:
     """Represents a match between font chunk and index entry"""
+    # One per matched chunk; slots drop the per-instance __dict__ (dataclass(slots=True) needs 3.10)
+    __slots__ = ('chunk_id', 'index_entry_id', 'match_score', 'match_type')
+
     chunk_id: str
     index_entry_id: str
     match_score: float
-    match_type: str  # 'exact', 'partial', 'inferred'
+    match_type: MatchType
+
+@dataclass
+class _EntryWordIndex:
+    """Entry title words as int32 postings: entries containing word id w are columns[offsets[w]:offsets[w + 1]]"""
+    vocabulary: Dict[str, int]
+    offsets: np.ndarray
+    columns: np.ndarray
+    word_counts: np.ndarray
+
+    @property
+    def cells(self) -> int:
+        """Array cells the postings hold, counted against _MAX_SCORE_CELLS"""
+        return len(self.offsets) + len(self.columns) + len(self.word_counts)
 
 class ChunkValidator:
     """Validates and enriches font-based chunks using index structure"""
 
-    def __init__(self, similarity_threshold: float = 0.6):
+    def __init__(self, similarity_threshold: float = 0.6, match_workers: int = -1):
         self.similarity_threshold = similarity_threshold
+        self.match_workers = match_workers  # rapidfuzz threads for title scoring (-1 = all cores)
         self.match_patterns = {
             # Common title variations
             'chapter_variations': [
                 r'chapter\s+(\d+):?\s*(.*)',
                 r'(\d+)\.\s*(.*)',
                 r'section\s+(\d+):?\s*(.*)'
-            ],
-            'cleanup_patterns': [
-                r'\s*\.{3,}\s*\d+\s*$',  # Remove dotted leaders and page numbers
-                r'\s*-{3,}\s*\d+\s*$',   # Remove dashed leaders and page numbers
-                r'^\s*[-•]\s*',          # Remove bullet points
-                r'\s+', ' '              # Normalize whitespace
             ]
         }
 
@@ -58,18 +126,21 @@ class ChunkValidator:
             # Clean and prepare data
             cleaned_chunks = self._prepare_chunks(font_chunks)
             index_entries = index_structure.get('index_entries', [])
+            cleaned_entries = self._prepare_index_entries(index_entries)
 
             # Find matches between chunks and index entries
-            matches = self._find_chunk_matches(cleaned_chunks, index_entries)
+            matches, matched_entry_ids, matched_chunk_ids = self._find_chunk_matches(
+                cleaned_chunks, cleaned_entries
+            )
 
             # Detect gaps and missing sections
             missing_sections = self._detect_missing_sections(
-                cleaned_chunks, index_entries, matches
+                index_entries, matched_entry_ids
             )
 
             # Identify orphaned chunks (no index match)
             orphaned_chunks = self._identify_orphaned_chunks(
-                cleaned_chunks, matches
+                cleaned_chunks, matched_chunk_ids
             )
 
             # Enrich chunk metadata
@@ -107,86 +178,218 @@ class ChunkValidator:
         cleaned_chunks = []
 
         for chunk in chunks:
-            # Create a copy to avoid modifying original
-            cleaned_chunk = chunk.copy()
-
-            # Clean title for comparison
+            # Clean title for comparison; the new dict leaves the original chunk unmodified
             title = chunk.get('title', '')
-            cleaned_title = self._clean_title(title)
-            cleaned_chunk['cleaned_title'] = cleaned_title
-            cleaned_chunk['original_title'] = title
-
-            cleaned_chunks.append(cleaned_chunk)
+            cleaned_chunks.append({
+                **chunk,
+                'cleaned_title': self._clean_title(title),
+                'original_title': title
+            })
 
         return cleaned_chunks
 
+    def _prepare_index_entries(self, index_entries: List[Dict]) -> List[Tuple[Dict, str]]:
+        """Pair each titled index entry with its cleaned title, cleaning every title once"""
+        cleaned_entries = []
+
+        for entry in index_entries:
+            cleaned_title = self._clean_title(entry.get('title', ''))
+            if cleaned_title:
+                cleaned_entries.append((entry, cleaned_title))
+
+        return cleaned_entries
+
     def _clean_title(self, title: str) -> str:
         """Clean title for better matching"""
-        cleaned = title.strip()
-
-        # Apply cleanup patterns
-        for pattern in self.match_patterns['cleanup_patterns']:
-            cleaned = re.sub(pattern, ' ' if pattern == r'\s+' else '', cleaned)
+        return _clean_title(title)
 
-        return cleaned.strip().lower()
+    def _find_chunk_matches(self, chunks: List[Dict], cleaned_entries: List[Tuple[Dict, str]]
+                           ) -> Tuple[List[ChunkMatch], Set[str], Set[str]]:
+        """Find matches between chunks and (entry, cleaned title) pairs.
 
-    def _find_chunk_matches(self, chunks: List[Dict],
-                           index_entries: List[Dict]) -> List[ChunkMatch]:
-        """Find matches between chunks and index entries"""
+        Also returns the matched entry ids and chunk ids, collected as matches are made.
+        """
         matches = []
+        matched_entry_ids = set()
+        matched_chunk_ids = set()
+
+        def add_match(chunk: Dict, entry: Dict, score: float, match_type: MatchType):
+            match = ChunkMatch(
+                chunk_id=chunk.get('title', ''),
+                index_entry_id=entry.get('entry_id', ''),
+                match_score=score,
+                match_type=match_type
+            )
+            matches.append(match)
+            matched_entry_ids.add(match.index_entry_id)
+            matched_chunk_ids.add(match.chunk_id)
+
+        if not cleaned_entries:
+            logger.info("Found 0 chunk-to-index matches")
+            return matches, matched_entry_ids, matched_chunk_ids
+
+        # Exact fast path: an identical cleaned title scores 1.0, the maximum, so the first
+        # entry with that title is the one the fuzzy scan would pick
+        entry_by_title = {}
+        for entry, entry_title in cleaned_entries:
+            entry_by_title.setdefault(entry_title, entry)
 
+        titled_chunks = []
         for chunk in chunks:
             chunk_title = chunk.get('cleaned_title', '')
             if not chunk_title:
                 continue
 
-            best_match = None
-            best_score = 0
-
-            for entry in index_entries:
-                entry_title = self._clean_title(entry.get('title', ''))
-                if not entry_title:
-                    continue
-
-                # Calculate similarity score
-                score = self._calculate_title_similarity(chunk_title, entry_title)
+            exact_entry = entry_by_title.get(chunk_title)
+            if exact_entry is not None:
+                add_match(chunk, exact_entry, 1.0, MatchType.exact)
+            else:
+                titled_chunks.append(chunk)
+
+        # Only the residual chunks go through fuzzy scoring
+        if not titled_chunks:
+            logger.info(f"Found {len(matches)} chunk-to-index matches")
+            return matches, matched_entry_ids, matched_chunk_ids
+
+        # Score chunks against every entry in row blocks (rows: chunks, columns: entries), keeping
+        # only each row's best entry so memory stays bounded for large documents and indexes
+        entry_titles = [entry_title for _, entry_title in cleaned_entries]
+        entry_words = self._entry_word_index(entry_titles)
+        block_size = max(1, (_MAX_SCORE_CELLS - entry_words.cells) // len(entry_titles))
+
+        for block_start in range(0, len(titled_chunks), block_size):
+            block = titled_chunks[block_start:block_start + block_size]
+            scores = self._title_similarity_matrix([chunk['cleaned_title'] for chunk in block], entry_titles,
+                                                   entry_words)
+            best_indices = scores.argmax(axis=1)  # First best entry, as the previous scalar scan picked
+            best_scores = scores[np.arange(len(block)), best_indices]
+
+            for chunk, best_idx, best_score in zip(block, best_indices, best_scores):
+                best_score = float(best_score)
+
+                if best_score > 0 and best_score >= self.similarity_threshold:
+                    best_match = cleaned_entries[best_idx][0]
+                    match_type = MatchType.exact if best_score > 0.9 else MatchType.partial
+                    add_match(chunk, best_match, best_score, match_type)
 
-                if score > best_score and score >= self.similarity_threshold:
-                    best_score = score
-                    best_match = entry
+        logger.info(f"Found {len(matches)} chunk-to-index matches")
+        return matches, matched_entry_ids, matched_chunk_ids
+
+    def _entry_word_index(self, entry_titles: List[str]) -> _EntryWordIndex:
+        """Build the word postings of the entry titles, once per match scan"""
+        postings = defaultdict(list)
+        word_counts = np.empty(len(entry_titles), dtype=np.float64)
+        for col, entry_title in enumerate(entry_titles):
+            words = set(entry_title.split())
+            word_counts[col] = len(words)
+            for word in words:
+                postings[word].append(col)
+
+        offsets = np.zeros(len(postings) + 1, dtype=np.int64)
+        np.cumsum([len(cols) for cols in postings.values()], dtype=np.int64, out=offsets[1:])
+        columns = np.fromiter((col for cols in postings.values() for col in cols), dtype=np.int32,
+                              count=int(offsets[-1]))
+        vocabulary = {word: word_id for word_id, word in enumerate(postings)}
+        return _EntryWordIndex(vocabulary, offsets, columns, word_counts)
+
+    def _title_similarity_matrix(self, chunk_titles: List[str], entry_titles: List[str],
+                                 entry_words: Optional[_EntryWordIndex] = None) -> np.ndarray:
+        """Pairwise _calculate_title_similarity scores as a (chunks, entries) matrix"""
+        if process is None:
+            return self._scalar_similarity_matrix(chunk_titles, entry_titles)
+
+        # Sequence similarity for all pairs in a single C++ call, spread over all cores (workers=-1)
+        similarity = process.cdist(chunk_titles, entry_titles, scorer=fuzz.ratio, dtype=np.float64,
+                                   workers=self.match_workers) / 100.0
+
+        # Word overlap = |shared words| / max(word counts). Shared counts add up the entry postings of
+        # each chunk word, so no dense chunk or entry word-incidence matrix is ever built
+        if entry_words is None:
+            entry_words = self._entry_word_index(entry_titles)
+        shared = np.zeros((len(chunk_titles), len(entry_titles)), dtype=np.int32)
+        chunk_counts = np.empty(len(chunk_titles), dtype=np.float64)
+        for row, chunk_title in enumerate(chunk_titles):
+            words = set(chunk_title.split())
+            chunk_counts[row] = len(words)
+            for word in words:
+                word_id = entry_words.vocabulary.get(word)
+                if word_id is not None:
+                    start, end = entry_words.offsets[word_id], entry_words.offsets[word_id + 1]
+                    shared[row, entry_words.columns[start:end]] += 1
+
+        entry_counts = entry_words.word_counts
+        largest = np.maximum.outer(chunk_counts, entry_counts)
+
+        # Combine with word overlap weighted more heavily, where both titles have words
+        has_words = np.outer(chunk_counts > 0, entry_counts > 0)
+        word_overlap = np.divide(shared, largest, out=np.zeros_like(largest), where=has_words)
+        return np.where(has_words, (similarity * 0.4) + (word_overlap * 0.6), similarity)
+
+    def _scalar_similarity_matrix(self, chunk_titles: List[str], entry_titles: List[str]) -> np.ndarray:
+        """Fallback for _title_similarity_matrix without rapidfuzz, scoring one pair at a time"""
+        scores = np.zeros((len(chunk_titles), len(entry_titles)), dtype=np.float64)
+        all_entries = range(len(entry_titles))
+
+        # Titles that share no word only get the 0.4-weighted sequence term, so above that threshold
+        # a chunk can only match entries sharing one of its words; look those up in an inverted index
+        postings = None
+        if self.similarity_threshold > 0.4:
+            postings = defaultdict(list)
+            wordless_entries = []
+            for col, entry_title in enumerate(entry_titles):
+                entry_words = set(entry_title.split())
+                if not entry_words:
+                    wordless_entries.append(col)
+                for word in entry_words:
+                    postings[word].append(col)
+
+        for row, chunk_title in enumerate(chunk_titles):
+            chunk_words = set(chunk_title.split())
+            if postings is None or not chunk_words:
+                candidates = all_entries
+            else:
+                candidates = set(wordless_entries).union(
+                    *(postings[word] for word in chunk_words if word in postings)
+                )
 
-            if best_match:
-                match_type = 'exact' if best_score > 0.9 else 'partial'
-                matches.append(ChunkMatch(
-                    chunk_id=chunk.get('title', ''),
-                    index_entry_id=best_match.get('entry_id', ''),
-                    match_score=best_score,
-                    match_type=match_type
-                ))
+            for col in candidates:
+                scores[row, col] = self._calculate_title_similarity(chunk_title, entry_titles[col])
 
-        logger.info(f"Found {len(matches)} chunk-to-index matches")
-        return matches
+        return scores
 
     def _calculate_title_similarity(self, title1: str, title2: str) -> float:
         """Calculate similarity between two titles"""
-        # Use sequence matcher for basic similarity
-        similarity = SequenceMatcher(None, title1, title2).ratio()
-
         # Boost score for exact word matches
         words1 = set(title1.split())
         words2 = set(title2.split())
-
-        if words1 and words2:
+        has_words = bool(words1 and words2)
+        if has_words:
             word_overlap = len(words1 & words2) / max(len(words1), len(words2))
+
+        # Both sequence ratios are at most 2 * min(len) / (len1 + len2). Pairs whose best possible
+        # score is still below the threshold can never be matched, so skip the sequence ratio
+        total_length = len(title1) + len(title2)
+        similarity_bound = 2.0 * min(len(title1), len(title2)) / total_length if total_length else 1.0
+        if has_words:
+            similarity_bound = (similarity_bound * 0.4) + (word_overlap * 0.6)
+        if similarity_bound < self.similarity_threshold - 1e-9:
+            return 0.0
+
+        # Sequence similarity for basic similarity
+        if fuzz is not None:
+            similarity = fuzz.ratio(title1, title2) / 100.0
+        else:
+            similarity = SequenceMatcher(None, title1, title2).ratio()
+
+        if has_words:
             # Combine similarity scores with word overlap weighted more heavily
             similarity = (similarity * 0.4) + (word_overlap * 0.6)
 
         return similarity
 
-    def _detect_missing_sections(self, chunks: List[Dict], index_entries: List[Dict],
-                                matches: List[ChunkMatch]) -> List[Dict]:
+    def _detect_missing_sections(self, index_entries: List[Dict],
+                                matched_entry_ids: Set[str]) -> List[Dict]:
         """Detect sections that appear in index but not in chunks"""
-        matched_entry_ids = {match.index_entry_id for match in matches}
         missing_sections = []
 
         for entry in index_entries:
@@ -205,9 +408,8 @@ class ChunkValidator:
         return missing_sections
 
     def _identify_orphaned_chunks(self, chunks: List[Dict],
-                                 matches: List[ChunkMatch]) -> List[Dict]:
+                                 matched_chunk_ids: Set[str]) -> List[Dict]:
         """Identify chunks that don't match any index entry"""
-        matched_chunk_ids = {match.chunk_id for match in matches}
         orphaned_chunks = []
 
         for chunk in chunks:
@@ -227,31 +429,29 @@ class ChunkValidator:
     def _enrich_chunk_metadata(self, chunks: List[Dict], matches: List[ChunkMatch],
                               index_entries: List[Dict]) -> List[Dict]:
         """Enrich chunks with index-derived metadata"""
+        # The chunks are the validator's own copies from _prepare_chunks, so enrich them in place
         # Create lookup for matches and index entries
         match_lookup = {match.chunk_id: match for match in matches}
         entry_lookup = {entry.get('entry_id', ''): entry for entry in index_entries}
 
         enriched_chunks = []
 
-        for chunk in chunks:
-            enriched_chunk = chunk.copy()
-            chunk_id = chunk.get('title', '')
+        for enriched_chunk in chunks:
+            chunk_id = enriched_chunk.get('title', '')
 
             # Add match information if available
             if chunk_id in match_lookup:
                 match = match_lookup[chunk_id]
                 entry = entry_lookup.get(match.index_entry_id, {})
 
-                enriched_chunk.update({
-                    'index_match': {
-                        'matched': True,
-                        'match_score': match.match_score,
-                        'match_type': match.match_type,
-                        'index_title': entry.get('title', ''),
-                        'index_page': entry.get('page'),
-                        'index_level': entry.get('level')
-                    }
-                })
+                enriched_chunk['index_match'] = {
+                    'matched': True,
+                    'match_score': match.match_score,
+                    'match_type': match.match_type.name,
+                    'index_title': entry.get('title', ''),
+                    'index_page': entry.get('page'),
+                    'index_level': entry.get('level')
+                }
             else:
                 enriched_chunk['index_match'] = {
                     'matched': False,
@@ -297,22 +497,24 @@ class ChunkValidator:
                                    orphaned_chunks: List[Dict],
                                    validation_score: float) -> Dict[str, Any]:
         """Generate enriched metadata for validation results"""
+        # Count every match type in one bincount over the integer match types
+        match_types = np.fromiter((match.match_type for match in matches), dtype=np.intp, count=len(matches))
+        type_counts = np.bincount(match_types, minlength=len(MatchType)).tolist()
+
         return {
             'validation_summary': {
                 'total_matches': len(matches),
-                'exact_matches': len([m for m in matches if m.match_type == 'exact']),
-                'partial_matches': len([m for m in matches if m.match_type == 'partial']),
+                'exact_matches': type_counts[MatchType.exact],
+                'partial_matches': type_counts[MatchType.partial],
                 'missing_sections': len(missing_sections),
                 'orphaned_chunks': len(orphaned_chunks),
                 'validation_score': validation_score
             },
             'match_distribution': {
-                match_type: len([m for m in matches if m.match_type == match_type])
-                for match_type in ['exact', 'partial', 'inferred']
+                match_type.name: type_counts[match_type]
+                for match_type in MatchType
             },
-            'validation_timestamp': logging.Formatter().formatTime(logging.LogRecord(
-                '', 0, '', 0, '', (), None
-            )),
+            'validation_timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
             'validation_method': 'hybrid_font_index'
         }
 
@@ -321,10 +523,13 @@ class ChunkValidator:
         """Create chunks for missing sections found in index"""
         created_chunks = []
 
+        # Lowercase the document once for all sections; sections are located by offset, not by line lists
+        document_lower = document_content.lower()
+
         for section in missing_sections:
             # Try to find content for this section in the document
             section_content = self._extract_section_content(
-                section, document_content
+                section, document_content, document_lower
             )
 
             if section_content:
@@ -354,33 +559,41 @@ class ChunkValidator:
         logger.info(f"Created {len(created_chunks)} chunks for missing sections")
         return created_chunks
 
-    def _extract_section_content(self, section: Dict,
-                               document_content: str) -> Optional[str]:
-        """Extract content for a missing section from document text"""
-        title = section['title']
-        page = section.get('page')
-
-        # Simple content extraction - look for the title in the document
-        lines = document_content.split('\n')
-        content_lines = []
-        found_start = False
-
-        for line in lines:
-            if not found_start and title.lower() in line.lower():
-                found_start = True
-                content_lines.append(line)
-            elif found_start:
-                # Stop if we hit another major heading
-                if (re.match(r'^\s*#+\s', line) or
-                    re.match(r'^\s*\d+\.\s', line) or
-                    re.match(r'(?i)^\s*chapter\s+\d+', line)):
-                    break
-                content_lines.append(line)
-                # Limit content extraction
-                if len(content_lines) > 50:
-                    break
-
-        return '\n'.join(content_lines) if content_lines else None
+    def _extract_section_content(self, section: Dict, document_content: str,
+                               document_lower: str) -> Optional[str]:
+        """Extract content for a missing section from the document (and its lowercased copy)"""
+        title_lower = section['title'].lower()
+
+        # Simple content extraction - look for the title in the document, on a single line
+        if '\n' in title_lower:
+            return None
+        title_start = document_lower.find(title_lower)
+        if title_start < 0:
+            return None
+
+        line_start = document_lower.rfind('\n', 0, title_start) + 1
+        if len(document_lower) != len(document_content):
+            # lower() expanded some characters, so offsets differ; locate the same line by number
+            line_number = document_lower.count('\n', 0, line_start)
+            line_start = 0
+            for _ in range(line_number):
+                line_start = document_content.index('\n', line_start) + 1
+
+        # Limit content extraction to the title line and the 50 lines after it, splitting only that slice
+        line_end = line_start - 1
+        for _ in range(51):
+            line_end = document_content.find('\n', line_end + 1)
+            if line_end < 0:
+                line_end = len(document_content)
+                break
+        lines = document_content[line_start:line_end].split('\n')
+
+        # Stop before the next major heading after the title line
+        section_end = next(
+            (i for i in range(1, len(lines)) if _SECTION_HEADING_RE.match(lines[i])), len(lines)
+        )
+
+        return '\n'.join(lines[:section_end])
 
     def _fallback_validation_result(self, original_chunks: List[Dict]) -> ValidationResult:
         """Return fallback result when validation fails"""
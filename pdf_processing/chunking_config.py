@@ -4,9 +4,28 @@ Configurable Chunking Settings
 Allows customization of chunking behavior for different document types and scenarios
 """
 
-from typing import Dict, List, Any
+import re
+from typing import Dict, List, Any, Tuple
 from dataclasses import dataclass
 
+# Heading markers ('#' runs with an optional trailing space) and 'Steps\n1.' procedure starts
+_QUALITY_MARKERS_RE = re.compile(r'(#+)( )?|Steps\n1\.')
+
+
+def _any_term_re(*terms: str) -> re.Pattern:
+    """Case-insensitive pattern matching any of the given literal terms"""
+    return re.compile('|'.join(re.escape(term) for term in terms), re.IGNORECASE)
+
+
+# Document type terms for detect_document_type, one alternation per check
+_SRM_FILENAME_RE = _any_term_re('srm', 'storage resource monitor', 'storageresourcemonitor')
+_SRM_CONTENT_RE = _any_term_re('srm', 'storage resource monitor', 'solutionpack', 'device discovery')
+_UPGRADE_FILENAME_RE = _any_term_re('upgrade', 'migration')
+_INSTALLATION_FILENAME_RE = _any_term_re('install', 'deployment')
+_CONFIGURATION_FILENAME_RE = _any_term_re('config', 'configuration')
+_SOLUTION_PACK_FILENAME_RE = _any_term_re('solution', 'pack')
+_UPGRADE_CONTENT_RE = _any_term_re('upgrade', 'migration', 'version')
+
 
 @dataclass
 class ChunkingConfig:
@@ -63,176 +82,199 @@ class ChunkingConfig:
             ]
 
 
+# Built once at import; get_config hands out these shared instances, which callers treat as read-only
+_DOCUMENT_TYPE_CONFIGS: Dict[str, ChunkingConfig] = {
+    "upgrade_guide": ChunkingConfig(
+        max_section_lines=50,  # Shorter sections for procedures
+        min_content_lines=2,
+        target_chunk_size=3000,  # Smaller chunks for procedural content
+        max_headings_per_chunk=3,
+        strong_boundary_patterns=[
+            r'^#+\s+(?:Chapter|Appendix)\s+\d+',
+            r'^#+\s+(?:Prerequisites|Before you begin)',
+            r'^#+\s+(?:About this task|Steps)',
+            r'^#+\s+(?:Results|What to do next)',
+            r'^#+\s+(?:Update|Upgrade)\s+\w+',  # Specific to upgrade docs
+        ],
+        weak_boundary_patterns=[
+            r'^#+\s+(?:Export|Import|Delete|Configure|Reconfiguring)',
+            r'^#+\s+\w+\s+(?:Discovery|Switch)',
+        ],
+    ),
+
+    "installation_guide": ChunkingConfig(
+        max_section_lines=80,
+        target_chunk_size=5000,
+        strong_boundary_patterns=[
+            r'^#+\s+(?:Chapter|Section)\s+\d+',
+            r'^#+\s+(?:Prerequisites|System Requirements)',
+            r'^#+\s+(?:Installation|Configuration)',
+            r'^#+\s+(?:Post-installation|Verification)',
+        ],
+    ),
+
+    "configuration_guide": ChunkingConfig(
+        max_section_lines=60,
+        target_chunk_size=4000,
+        max_headings_per_chunk=4,
+        strong_boundary_patterns=[
+            r'^#+\s+(?:Configuring|Setting up)',
+            r'^#+\s+(?:Prerequisites|Requirements)',
+            r'^#+\s+(?:Examples|Use Cases)',
+        ],
+    ),
+
+    "solution_pack_guide": ChunkingConfig(
+        max_section_lines=70,
+        target_chunk_size=4500,
+        strong_boundary_patterns=[
+            r'^#+\s+(?:Chapter|Section)\s+\d+',
+            r'^#+\s+(?:Deploying|Installing)\s+.*SolutionPack',
+            r'^#+\s+(?:SolutionPack\s+for)\s+',
+            r'^#+\s+(?:Discovery\s+Center|Device\s+Config\s+Wizard)',
+            r'^#+\s+(?:Getting\s+Started|Troubleshooting)',
+        ],
+        weak_boundary_patterns=[
+            r'^#+\s+(?:Add\s+new|Adding|Configure|Configuring)',
+            r'^#+\s+(?:Install|Installing|Setup|Setting\s+up)',
+            r'^#+\s+(?:Running\s+the|Enable|Enabling)',
+            r'^#+\s+(?:VMware|Dell|IBM|HP|Cisco)\s+',
+            r'^#+\s+.*(?:Discovery|Configuration|Installation)$',
+        ],
+    ),
+
+    "srm_specific": ChunkingConfig(
+        max_section_lines=60,  # Reduced to create more focused chunks
+        min_content_lines=3,
+        target_chunk_size=3500,  # Smaller target size for better granularity
+        max_chunk_size=6000,  # Reduced max size
+        max_headings_per_chunk=3,  # Reduced to prevent over-inclusion
+        max_over_inclusion_ratio=0.20,  # Stricter ratio
+        strong_boundary_patterns=[
+            # Chapter and major section boundaries
+            r'^#+\s+(?:Chapter|Section)\s+\d+',
+            r'^#+\s+(?:Part|Appendix)\s+[A-Z]',
+
+            # SRM-specific installation and configuration
+            r'^#+\s+(?:Installing|Deploying)\s+.*(?:SolutionPack|Solution Pack)',
+            r'^#+\s+(?:Configuring|Setting up)\s+.*(?:SRM|StorageResourceMonitor)',
+            r'^#+\s+(?:Adding|Installing)\s+.*(?:Discovery|Device)',
+
+            # Major procedural boundaries
+            r'^#+\s+(?:Prerequisites|System Requirements|Before you begin)',
+            r'^#+\s+(?:Post-installation|Verification|Next steps)',
+            r'^#+\s+(?:Troubleshooting|Known Issues)',
+
+            # SRM-specific components
+            r'^#+\s+(?:Frontend|Backend)\s+Server',
+            r'^#+\s+(?:Load\s+[Bb]alancer|NFS\s+[Ss]hare)',
+            r'^#+\s+(?:Database|MySQL)\s+Configuration',
+            
+            # CRITICAL: Add patterns for common SRM sections that should be separate chunks
+            r'^#+\s+(?:Verifying|Troubleshooting|Logging|Connecting|Editing|Updating)',
+            r'^#+\s+(?:Operating system|Command|Option|Description)',
+            r'^#+\s+(?:About this task|Steps|Prerequisites)',
+            
+            # CRITICAL FIX: Exclude bullet point references that mention other sections
+            # These should NOT be treated as section boundaries
+        ],
+        weak_boundary_patterns=[
+            # Common SRM operations
+            r'^#+\s+(?:Install|Add|Remove|Delete|Update|Upgrade)',
+            r'^#+\s+(?:Configure|Reconfiguring|Setup|Enable|Disable)',
+            r'^#+\s+(?:Export|Import|Backup|Restore)',
+            r'^#+\s+(?:Create|Modify|Edit)\s+.*(?:Report|Task|Schedule)',
+
+            # SRM discovery and monitoring
+            r'^#+\s+.*Discovery.*(?:Configuration|Setup)',
+            r'^#+\s+.*Monitoring.*(?:Setup|Configuration)',
+            r'^#+\s+.*SolutionPack.*(?:Installation|Configuration)',
+
+            # Specific SRM features
+            r'^#+\s+(?:Shared\s+Reports|Scheduled\s+Tasks)',
+            r'^#+\s+(?:Management\s+Functions|User\s+Reports)',
+        ],
+        transition_markers=[
+            'About this task',
+            'Before you begin',
+            'Prerequisites',
+            'System requirements',
+            'What to do next',
+            'Next steps',
+            'Results',
+            'Troubleshooting',
+            'Examples',
+            'Notes',
+            'Important',
+            'Caution',
+            'Warning',
+            'SolutionPack installation',
+            'Device discovery',
+            'Configuration verification'
+        ]
+    ),
+
+    "default": ChunkingConfig()  # Standard settings
+}
+
+
 class DocumentTypeConfigs:
     """Predefined configurations for different document types"""
 
     @staticmethod
     def get_config(doc_type: str = "default") -> ChunkingConfig:
         """Get configuration for specific document type"""
-
-        configs = {
-            "upgrade_guide": ChunkingConfig(
-                max_section_lines=50,  # Shorter sections for procedures
-                min_content_lines=2,
-                target_chunk_size=3000,  # Smaller chunks for procedural content
-                max_headings_per_chunk=3,
-                strong_boundary_patterns=[
-                    r'^#+\s+(?:Chapter|Appendix)\s+\d+',
-                    r'^#+\s+(?:Prerequisites|Before you begin)',
-                    r'^#+\s+(?:About this task|Steps)',
-                    r'^#+\s+(?:Results|What to do next)',
-                    r'^#+\s+(?:Update|Upgrade)\s+\w+',  # Specific to upgrade docs
-                ],
-                weak_boundary_patterns=[
-                    r'^#+\s+(?:Export|Import|Delete|Configure|Reconfiguring)',
-                    r'^#+\s+\w+\s+(?:Discovery|Switch)',
-                ],
-            ),
-
-            "installation_guide": ChunkingConfig(
-                max_section_lines=80,
-                target_chunk_size=5000,
-                strong_boundary_patterns=[
-                    r'^#+\s+(?:Chapter|Section)\s+\d+',
-                    r'^#+\s+(?:Prerequisites|System Requirements)',
-                    r'^#+\s+(?:Installation|Configuration)',
-                    r'^#+\s+(?:Post-installation|Verification)',
-                ],
-            ),
-
-            "configuration_guide": ChunkingConfig(
-                max_section_lines=60,
-                target_chunk_size=4000,
-                max_headings_per_chunk=4,
-                strong_boundary_patterns=[
-                    r'^#+\s+(?:Configuring|Setting up)',
-                    r'^#+\s+(?:Prerequisites|Requirements)',
-                    r'^#+\s+(?:Examples|Use Cases)',
-                ],
-            ),
-
-            "solution_pack_guide": ChunkingConfig(
-                max_section_lines=70,
-                target_chunk_size=4500,
-                strong_boundary_patterns=[
-                    r'^#+\s+(?:Chapter|Section)\s+\d+',
-                    r'^#+\s+(?:Deploying|Installing)\s+.*SolutionPack',
-                    r'^#+\s+(?:SolutionPack\s+for)\s+',
-                    r'^#+\s+(?:Discovery\s+Center|Device\s+Config\s+Wizard)',
-                    r'^#+\s+(?:Getting\s+Started|Troubleshooting)',
-                ],
-                weak_boundary_patterns=[
-                    r'^#+\s+(?:Add\s+new|Adding|Configure|Configuring)',
-                    r'^#+\s+(?:Install|Installing|Setup|Setting\s+up)',
-                    r'^#+\s+(?:Running\s+the|Enable|Enabling)',
-                    r'^#+\s+(?:VMware|Dell|IBM|HP|Cisco)\s+',
-                    r'^#+\s+.*(?:Discovery|Configuration|Installation)$',
-                ],
-            ),
-
-            "srm_specific": ChunkingConfig(
-                max_section_lines=60,  # Reduced to create more focused chunks
-                min_content_lines=3,
-                target_chunk_size=3500,  # Smaller target size for better granularity
-                max_chunk_size=6000,  # Reduced max size
-                max_headings_per_chunk=3,  # Reduced to prevent over-inclusion
-                max_over_inclusion_ratio=0.20,  # Stricter ratio
-                strong_boundary_patterns=[
-                    # Chapter and major section boundaries
-                    r'^#+\s+(?:Chapter|Section)\s+\d+',
-                    r'^#+\s+(?:Part|Appendix)\s+[A-Z]',
-
-                    # SRM-specific installation and configuration
-                    r'^#+\s+(?:Installing|Deploying)\s+.*(?:SolutionPack|Solution Pack)',
-                    r'^#+\s+(?:Configuring|Setting up)\s+.*(?:SRM|StorageResourceMonitor)',
-                    r'^#+\s+(?:Adding|Installing)\s+.*(?:Discovery|Device)',
-
-                    # Major procedural boundaries
-                    r'^#+\s+(?:Prerequisites|System Requirements|Before you begin)',
-                    r'^#+\s+(?:Post-installation|Verification|Next steps)',
-                    r'^#+\s+(?:Troubleshooting|Known Issues)',
-
-                    # SRM-specific components
-                    r'^#+\s+(?:Frontend|Backend)\s+Server',
-                    r'^#+\s+(?:Load\s+[Bb]alancer|NFS\s+[Ss]hare)',
-                    r'^#+\s+(?:Database|MySQL)\s+Configuration',
-                    
-                    # CRITICAL: Add patterns for common SRM sections that should be separate chunks
-                    r'^#+\s+(?:Verifying|Troubleshooting|Logging|Connecting|Editing|Updating)',
-                    r'^#+\s+(?:Operating system|Command|Option|Description)',
-                    r'^#+\s+(?:About this task|Steps|Prerequisites)',
-                    
-                    # CRITICAL FIX: Exclude bullet point references that mention other sections
-                    # These should NOT be treated as section boundaries
-                ],
-                weak_boundary_patterns=[
-                    # Common SRM operations
-                    r'^#+\s+(?:Install|Add|Remove|Delete|Update|Upgrade)',
-                    r'^#+\s+(?:Configure|Reconfiguring|Setup|Enable|Disable)',
-                    r'^#+\s+(?:Export|Import|Backup|Restore)',
-                    r'^#+\s+(?:Create|Modify|Edit)\s+.*(?:Report|Task|Schedule)',
-
-                    # SRM discovery and monitoring
-                    r'^#+\s+.*Discovery.*(?:Configuration|Setup)',
-                    r'^#+\s+.*Monitoring.*(?:Setup|Configuration)',
-                    r'^#+\s+.*SolutionPack.*(?:Installation|Configuration)',
-
-                    # Specific SRM features
-                    r'^#+\s+(?:Shared\s+Reports|Scheduled\s+Tasks)',
-                    r'^#+\s+(?:Management\s+Functions|User\s+Reports)',
-                ],
-                transition_markers=[
-                    'About this task',
-                    'Before you begin',
-                    'Prerequisites',
-                    'System requirements',
-                    'What to do next',
-                    'Next steps',
-                    'Results',
-                    'Troubleshooting',
-                    'Examples',
-                    'Notes',
-                    'Important',
-                    'Caution',
-                    'Warning',
-                    'SolutionPack installation',
-                    'Device discovery',
-                    'Configuration verification'
-                ]
-            ),
-
-            "default": ChunkingConfig()  # Standard settings
-        }
-
-        return configs.get(doc_type, configs["default"])
+        return _DOCUMENT_TYPE_CONFIGS.get(doc_type, _DOCUMENT_TYPE_CONFIGS["default"])
 
     @staticmethod
     def detect_document_type(filename: str, content_preview: str = "") -> str:
         """Auto-detect document type from filename and content"""
-        filename_lower = filename.lower()
-        content_lower = content_preview.lower()
-
         # Check for SRM-specific documents first
-        if any(term in filename_lower for term in ['srm', 'storage resource monitor', 'storageresourcemonitor']):
+        if _SRM_FILENAME_RE.search(filename):
             return "srm_specific"
-        elif any(term in content_lower for term in ['srm', 'storage resource monitor', 'solutionpack', 'device discovery']):
+        elif _SRM_CONTENT_RE.search(content_preview):
             return "srm_specific"
 
         # Fallback to generic document types
-        elif any(term in filename_lower for term in ['upgrade', 'migration']):
+        elif _UPGRADE_FILENAME_RE.search(filename):
             return "upgrade_guide"
-        elif any(term in filename_lower for term in ['install', 'deployment']):
+        elif _INSTALLATION_FILENAME_RE.search(filename):
             return "installation_guide"
-        elif any(term in filename_lower for term in ['config', 'configuration']):
+        elif _CONFIGURATION_FILENAME_RE.search(filename):
             return "configuration_guide"
-        elif any(term in filename_lower for term in ['solution', 'pack']):
+        elif _SOLUTION_PACK_FILENAME_RE.search(filename):
             return "solution_pack_guide"
-        elif any(term in content_lower for term in ['upgrade', 'migration', 'version']):
+        elif _UPGRADE_CONTENT_RE.search(content_preview):
             return "upgrade_guide"
         else:
             return "default"
 
 
+def _count_quality_markers(content: str) -> Tuple[int, int]:
+    """Count heading markers and procedure blocks in one scan.
+
+    Equivalent to content.count('##') + content.count('# ') and
+    content.count('Steps\\n1.') + content.count('## Steps'): a run of k '#' holds k // 2
+    non-overlapping '##', plus one '# ' if a space follows it.
+    """
+    heading_count = 0
+    procedure_blocks = 0
+
+    for match in _QUALITY_MARKERS_RE.finditer(content):
+        hashes = match.group(1)
+        if hashes is None:
+            procedure_blocks += 1  # 'Steps\n1.'
+            continue
+
+        heading_count += len(hashes) // 2
+        if match.group(2):
+            heading_count += 1
+            if len(hashes) >= 2 and content.startswith('Steps', match.end()):
+                procedure_blocks += 1  # '## Steps'
+
+    return heading_count, procedure_blocks
+
+
 def validate_chunking_quality(chunks: List[Dict[str, Any]], config: ChunkingConfig) -> Dict[str, Any]:
     """Validate chunking quality against configuration thresholds"""
 
@@ -248,11 +290,10 @@ def validate_chunking_quality(chunks: List[Dict[str, Any]], config: ChunkingConf
         chunk_issues = []
 
         # Check for over-inclusion indicators
-        heading_count = content.count('##') + content.count('# ')
+        heading_count, procedure_blocks = _count_quality_markers(content)
         if heading_count > config.max_headings_per_chunk:
             chunk_issues.append(f'Too many headings ({heading_count})')
 
-        procedure_blocks = content.count('Steps\n1.') + content.count('## Steps')
         if procedure_blocks > config.max_procedure_blocks:
             chunk_issues.append(f'Multiple procedures ({procedure_blocks})')
 
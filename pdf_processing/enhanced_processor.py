@@ -7,6 +7,10 @@ Implements multi-level chunking based on font hierarchy and page breaks
 import os
 import json
 import logging
+import threading
+from bisect import bisect_right
+from collections import Counter
+from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Any, Optional, Tuple
@@ -22,25 +26,178 @@ except ImportError as e:
     print("Install with: pip install sentence-transformers faiss-cpu numpy")
     raise
 
+# orjson serializes straight to UTF-8 bytes and much faster than json; json remains the fallback
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 from .extractor import PDFExtractor
 from .index_extractor import IndexExtractor
 from .chunk_validator import ChunkValidator
 from .chunking_config import DocumentTypeConfigs, validate_chunking_quality
+from .vector_index import DEFAULT_INDEX_TYPE, build_faiss_index
+from .extraction_workers import create_extraction_pool, extract_document_in_worker
 
 logger = logging.getLogger(__name__)
 
+# Markdown headings: the '#' run (level) and the heading text
+_HEADING_LEVEL_RE = re.compile(r'^#+')
+_HEADING_TEXT_RE = re.compile(r'^#+\s*(.+)')
+
+# Section end boundaries: a "Steps" heading, and headings that start a new major topic
+_STEPS_HEADING_RE = re.compile(r'^#+\s+Steps\s*$')
+_MAJOR_SECTION_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern in (
+    r'^#+\s+(?:Verifying|Troubleshooting|Logging|Connecting|Editing|Updating)',
+    r'^#+\s+(?:Operating system|Command|Option|Description)',
+    r'^#+\s+(?:Prerequisites|Steps|About this task)',
+)]
+
+# Section title normalization: leading bullets, dashes and numbers; whitespace runs
+_TITLE_LEADER_RE = re.compile(r'^[-•\d\.\s]+')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# Section titles that look like TOC entries: bullets, dot leaders, trailing page numbers
+_TOC_PATTERNS = [re.compile(pattern) for pattern in (
+    r'^\s*[-•]\s*',  # Bullet points
+    r'\.{3,}',       # Dot leaders
+    r'\s+\d+\s*$',   # Ending with page numbers
+)]
+
+# Bullet points that reference other sections rather than being sections themselves
+_BULLET_REFERENCE_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern in (
+    r'^-\s+.*installing on.*',
+    r'^-\s+.*complete the steps.*',
+    r'^-\s+.*described in.*',
+    r'^-\s+.*as described in.*',
+    r'^-\s+.*refer to.*',
+    r'^-\s+.*see.*',
+)]
+
+# Subsection headings (16pt and smaller) that large chapters are split on
+_SUBSECTION_HEADING_RE = re.compile(r'^#{2,4}\s+(.+)$')
+
+# Numbered steps, excluding NOTEs
+_NUMBERED_STEP_RE = re.compile(r'^(\d+)\.\s+(?!NOTE:)(.+)')
+
+# Procedure list cleanup: numbered items, numbered NOTEs, and file paths that were numbered by mistake
+_NUMBERED_ITEM_RE = re.compile(r'^\d+\.\s')
+_NUMBER_PREFIX_RE = re.compile(r'^\d+\.\s+')
+_NUMBERED_NOTE_RE = re.compile(r'^(\d+)\.\s+(NOTE:.*)')
+_NUMBERED_NOTE_LABEL_RE = re.compile(r'^(\d+\.)\s+(NOTE:)', re.MULTILINE)
+_NUMBERED_ELIDED_PATH_RE = re.compile(r'^\d+\.\s+…/')
+_EXCESS_BLANK_LINES_RE = re.compile(r'\n\n\n+')
+
+_PROCEDURE_PATTERNS = [re.compile(pattern, re.MULTILINE | re.IGNORECASE) for pattern in (
+    r'^\d+\.\s+\w+',  # Numbered steps
+    r'Step \d+',      # Step indicators
+    r'Follow these steps',  # Procedure indicators
+    r'To \w+.*:$',    # Action instructions
+)]
+# Lowercase substrings at least one non-numbered procedure pattern needs in order to match
+_PROCEDURE_KEYWORDS = ('step ', 'follow these steps', 'to ')
+_DIGIT_DOT_RE = re.compile(r'\d\.')
+
+_STRUCTURED_TABLE_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern in (
+    r'^\|.*\|.*\|',  # Multiple columns with pipes
+    r'^\|.*Option.*\|',  # Option column
+    r'^\|.*Description.*\|',  # Description column
+    r'^\|.*Linux.*\|',  # Linux entries
+    r'^\|.*Windows.*\|',  # Windows entries
+    r'^\|.*UNIX.*\|',  # UNIX entries
+    r'^\|.*Command.*\|',  # Command entries
+    r'^\|.*Operating system.*\|',  # Operating system entries
+)]
+
+# Page numbers followed by titles without proper line breaks, e.g. "...15 Modifying the start order..."
+_TABLE_OVERFLOW_PATTERNS = [re.compile(pattern) for pattern in (
+    r'\.{3,}\d+\s+[A-Z][a-z]+',  # Dots followed by page number and title
+    r'\d+\s+[A-Z][a-z]+.*\d+\s*\|',  # Page number, title, then another page number at end
+)]
+# Where concatenated entries meet: "...pagenum Text", Text starting with a capital letter
+_TABLE_OVERFLOW_SPLIT_RE = re.compile(r'(\.{3,}\d+)\s+([A-Z][^|]*?)(?=\s*\d+\s*\||\s*$)')
+_TOC_ENTRY_RE = re.compile(r'^([^|]*?)(\.{3,}\d+)')
+_TRAILING_PAGE_NUMBER_RE = re.compile(r'\s*\d+\s*\|?\s*$')
+
+# process_documents embeds the chunks of several documents in one encode call once this many are pending
+_ENCODE_GROUP_CHUNKS = 4096
+
+# Texts per model.encode call; each slice's output is copied straight into the preallocated float32 result
+_ENCODE_SLICE_TEXTS = 1024
+
+# Extraction results that indexing and saving still read once a document is chunked
+_RETAINED_EXTRACTION_KEYS = ('font_analysis', 'enhanced_structure', 'content_length')
+
+# Embedding models shared by every processor in the process, keyed by (model_name, backend)
+_MODEL_CACHE: Dict[Tuple[str, str], SentenceTransformer] = {}
+_MODEL_CACHE_LOCK = threading.Lock()
+
+
+@dataclass
+class _MarkdownSource:
+    """A document's full markdown, split into lines once, with heading text -> first line index"""
+    content: str
+    lines: List[str]
+    heading_lines: Dict[str, int]
+
+
+def _unique_titles(*titles: str) -> List[str]:
+    """Titles in order with repeats dropped (a section often carries its chapter's title)"""
+    return list(dict.fromkeys(titles))
+
+
+def _write_json(path, data: Any):
+    """Write data as indented UTF-8 JSON"""
+    if orjson is not None:
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+                                 | orjson.OPT_SERIALIZE_NUMPY))
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+
+
+# Font hierarchy mapping (based on analysis)
+_FONT_HIERARCHY = {
+    'document_title': {'size_range': (22, 28), 'level': 1},
+    'chapter_major': {'size_range': (20, 21.9), 'level': 2},
+    'section_standard': {'size_range': (16, 19.9), 'level': 3},
+    'subsection_minor': {'size_range': (11.5, 15.9), 'level': 4},
+    'table_figure': {'size_range': (10, 11.4), 'level': 5},
+    'body_text': {'size_range': (8, 9.9), 'level': 6}
+}
+
+# A size takes the largest class whose lower bound it reaches; this also resolves sizes in the
+# gaps between ranges and beyond either end, so _classify_by_font_size is one bisect
+_FONT_CLASSES_BY_MIN_SIZE = sorted(_FONT_HIERARCHY.items(), key=lambda item: item[1]['size_range'][0])
+_FONT_SIZE_BOUNDS = tuple(properties['size_range'][0] for _, properties in _FONT_CLASSES_BY_MIN_SIZE[1:])
+_FONT_SIZE_CLASSES = tuple(chunk_type for chunk_type, _ in _FONT_CLASSES_BY_MIN_SIZE)
+
+
 class EnhancedPDFProcessor:
     """Enhanced processor with hybrid font-index chunking"""
 
+    # Static font hierarchy shared by all instances
+    font_hierarchy = _FONT_HIERARCHY
+
     def __init__(self, output_dir: str = "extracted_docs", index_dir: str = "indexes",
                  model_name: str = 'all-MiniLM-L6-v2', max_chunk_size: int = 8000,
-                 enable_hybrid_chunking: bool = True, document_type: str = "auto"):
+                 enable_hybrid_chunking: bool = True, document_type: str = "auto",
+                 index_type: str = DEFAULT_INDEX_TYPE, index_params: Optional[Dict[str, Any]] = None,
+                 encode_batch_size: int = 64, embedding_backend: str = 'torch',
+                 torch_threads: Optional[int] = None, save_markdown: bool = False,
+                 verbose: bool = False):
         self.output_dir = Path(output_dir)
         self.index_dir = Path(index_dir)
         self.model_name = model_name
         self.max_chunk_size = max_chunk_size
+        self.index_type = index_type
+        self.index_params = index_params or {}
+        self.encode_batch_size = encode_batch_size
         self.enable_hybrid_chunking = enable_hybrid_chunking
         self.document_type = document_type
+        self.save_markdown = save_markdown  # Also write complete_content.md (nothing reads it back)
+        self.verbose = verbose  # Show encode progress bars (a tqdm bar per encode slice)
 
         # Create directories
         self.output_dir.mkdir(exist_ok=True)
@@ -48,7 +205,20 @@ class EnhancedPDFProcessor:
 
         # Initialize components
         self.extractor = PDFExtractor()
-        self.model = SentenceTransformer(model_name)
+        self.model = self._get_embedding_model(model_name, embedding_backend)
+        
+        # Half precision on GPU; embeddings are cast back to float32 before indexing
+        self._half_precision = (getattr(self.model, 'backend', 'torch') == 'torch'
+                                and self.model.device.type == 'cuda')
+        if self._half_precision:
+            self.model.half()
+        
+        # CPU encoding threads (PyTorch otherwise picks its own default, which can be far below the core count).
+        # FAISS gets the same count so its OpenMP pool (index training/add) doesn't oversubscribe the cores.
+        if torch_threads:
+            import torch
+            torch.set_num_threads(torch_threads)
+            faiss.omp_set_num_threads(torch_threads)
 
         # Initialize hybrid chunking components
         if self.enable_hybrid_chunking:
@@ -57,19 +227,53 @@ class EnhancedPDFProcessor:
 
         # Chunking configuration will be set per document
         self.chunking_config = None
+    
+    def _get_embedding_model(self, model_name: str, backend: str = 'torch') -> SentenceTransformer:
+        """Return the process-wide model for (model_name, backend), loading it on first use"""
+        key = (model_name, backend)
+        # Held while loading so concurrent first callers don't each load the weights
+        with _MODEL_CACHE_LOCK:
+            model = _MODEL_CACHE.get(key)
+            if model is None:
+                model = _MODEL_CACHE[key] = self._load_embedding_model(model_name, backend)
+        return model
+    
+    def _load_embedding_model(self, model_name: str, backend: str = 'torch') -> SentenceTransformer:
+        """Load the embedding model on ONNX Runtime when requested and available, otherwise on PyTorch"""
+        if backend != 'onnx':
+            return SentenceTransformer(model_name)
         
-        # Font hierarchy mapping (based on analysis)
-        self.font_hierarchy = {
-            'document_title': {'size_range': (22, 28), 'level': 1},
-            'chapter_major': {'size_range': (20, 21.9), 'level': 2},
-            'section_standard': {'size_range': (16, 19.9), 'level': 3},
-            'subsection_minor': {'size_range': (11.5, 15.9), 'level': 4},
-            'table_figure': {'size_range': (10, 11.4), 'level': 5},
-            'body_text': {'size_range': (8, 9.9), 'level': 6}
-        }
+        # Models without a published ONNX graph are exported on first load and cached here
+        onnx_cache_dir = self.output_dir / '.onnx_cache' / model_name.replace('/', '_')
+        try:
+            if onnx_cache_dir.exists():
+                return SentenceTransformer(str(onnx_cache_dir), backend='onnx')
+            
+            import torch
+            # O4 is O3's fused graph plus fp16, which only pays off on GPU
+            file_name = 'onnx/model_O4.onnx' if torch.cuda.is_available() else 'onnx/model_O3.onnx'
+            try:
+                return SentenceTransformer(model_name, backend='onnx', model_kwargs={'file_name': file_name})
+            except Exception as e:
+                logger.info(f"No optimized ONNX graph for {model_name} ({e}), exporting one")
+            
+            model = SentenceTransformer(model_name, backend='onnx')
+            model.save(str(onnx_cache_dir))
+            return model
+        except Exception as e:
+            # Older sentence-transformers (no backend argument) or onnxruntime not installed
+            logger.warning(f"ONNX backend unavailable ({e}), using PyTorch")
+            return SentenceTransformer(model_name)
     
-    def process_document(self, pdf_path: str, document_id: str) -> Dict[str, Any]:
+    def process_document(self, pdf_path: str, document_id: str,
+                         extracted_data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Process a single PDF document with adaptive chunking based on document type"""
+        document = self._chunk_document(pdf_path, document_id, extracted_data)
+        return self._index_and_save_document(document)
+
+    def _chunk_document(self, pdf_path: str, document_id: str,
+                        extracted_data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Extract and chunk a single document: everything in process_document before embedding"""
         logger.info(f"Processing document with hybrid chunking: {pdf_path} -> {document_id}")
 
         # Detect document type and set configuration
@@ -84,17 +288,22 @@ class EnhancedPDFProcessor:
         doc_dir = self.output_dir / document_id
         doc_dir.mkdir(exist_ok=True)
 
-        # Extract with hybrid method
-        extracted_data = self.extractor.extract_document(pdf_path)
+        # Extract with hybrid method (unless a worker process already did)
+        if extracted_data is None:
+            extracted_data = self.extractor.extract_document(pdf_path)
 
-        # Store full markdown content for section extraction
-        self._full_markdown_content = extracted_data.get('full_text', '')
+        # Full markdown content for section extraction, split into lines and with its headings
+        # indexed once rather than on every section lookup; passed down explicitly, not kept on self
+        full_markdown = extracted_data.get('full_text', '')
+        markdown_lines = full_markdown.split('\n')
+        markdown = _MarkdownSource(full_markdown, markdown_lines, self._index_markdown_headings(markdown_lines))
 
         logger.info(f"Extracted content length: {extracted_data['content_length']} characters")
         logger.info(f"Found {len(extracted_data['enhanced_structure']['chapters'])} chapters")
 
         # Create base font-based chunks
-        font_chunks = self._create_enhanced_chunks(extracted_data['enhanced_structure'], extracted_data['font_analysis'])
+        font_chunks = self._create_enhanced_chunks(extracted_data['enhanced_structure'], extracted_data['font_analysis'],
+                                                   markdown)
 
         # CRITICAL FIX: Validate and fix structural problems before chunking
         font_chunks = self._validate_and_fix_structure(font_chunks, extracted_data['enhanced_structure'])
@@ -102,7 +311,7 @@ class EnhancedPDFProcessor:
         # Apply hybrid chunking if enabled
         if self.enable_hybrid_chunking:
             final_chunks, hybrid_metadata = self._apply_hybrid_chunking(
-                font_chunks, extracted_data, self._full_markdown_content
+                font_chunks, extracted_data, markdown.content
             )
         else:
             final_chunks = font_chunks
@@ -112,22 +321,49 @@ class EnhancedPDFProcessor:
         quality_report = validate_chunking_quality(final_chunks, self.chunking_config)
         logger.info(f"Chunking quality: {quality_report['status']} ({quality_report['over_inclusion_ratio']:.1%} over-inclusion)")
 
+        # Chunked documents can wait in process_documents for a shared encode; don't keep the full
+        # markdown and docling JSON alive with them unless the markdown is going to be saved
+        retained_keys = _RETAINED_EXTRACTION_KEYS + (('full_text',) if self.save_markdown else ())
+
+        return {
+            'document_id': document_id,
+            'document_type': detected_type,
+            'doc_dir': doc_dir,
+            'extracted_data': {key: extracted_data[key] for key in retained_keys},
+            'chunks': final_chunks,
+            'hybrid_metadata': hybrid_metadata,
+            'quality_report': quality_report
+        }
+
+    def _index_and_save_document(self, document: Dict[str, Any],
+                                 embeddings: Optional[np.ndarray] = None) -> Dict[str, Any]:
+        """Build the vector index for a chunked document and save everything (embeddings: precomputed, normalized)"""
+        document_id = document['document_id']
+        extracted_data = document['extracted_data']
+        final_chunks = document['chunks']
+        hybrid_metadata = document['hybrid_metadata']
+        quality_report = document['quality_report']
+
         # Create vector index
-        vector_data = self._create_vector_index(final_chunks)
+        vector_data = self._create_vector_index(final_chunks, embeddings)
+
+        # Counted once for both the saved analysis and the returned summary
+        chunk_types = self._analyze_chunk_types(final_chunks)
 
         # Save all data including hybrid results and quality report
-        self._save_enhanced_data(doc_dir, document_id, extracted_data, final_chunks, hybrid_metadata, quality_report)
+        self._save_enhanced_data(document['doc_dir'], document_id, extracted_data, final_chunks,
+                                 hybrid_metadata, quality_report, chunk_types)
 
         # Save vector indexes
         self._save_vector_indexes(document_id, vector_data)
 
         return {
             'document_id': document_id,
-            'document_type': detected_type,
+            'document_type': document['document_type'],
             'total_chapters': len(extracted_data['enhanced_structure']['chapters']),
             'total_sections': extracted_data['enhanced_structure']['total_sections'],
             'total_chunks': len(final_chunks),
-            'chunk_types': self._analyze_chunk_types(final_chunks),
+            'chunk_types': chunk_types,
             'content_length': extracted_data['content_length'],
             'vector_dimension': vector_data['embedding_model'],
             'extraction_method': 'hybrid_font_index' if self.enable_hybrid_chunking else 'enhanced_page_aware',
@@ -136,7 +372,78 @@ class EnhancedPDFProcessor:
             'processing_time': datetime.now().isoformat()
         }
     
-    def _create_enhanced_chunks(self, structure: Dict, font_analysis: Dict) -> List[Dict]:
+    def process_documents(self, jobs: List[Tuple[str, str]], max_workers: Optional[int] = None) -> List[Any]:
+        """Process (pdf_path, document_id) jobs with PDF extraction fanned out to worker processes.
+        
+        Only extraction runs in the pool; chunking and embedding stay here so the model is loaded
+        once. Chunks from consecutive documents are embedded together in a single encode call.
+        Returns, per job, the process_document result or the exception it raised.
+        """
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        max_workers = max(1, min(max_workers, len(jobs)))
+        
+        executor = None
+        extraction_futures = [None] * len(jobs)
+        if max_workers > 1:
+            logger.info(f"Extracting {len(jobs)} documents with {max_workers} worker processes")
+            executor = create_extraction_pool(max_workers)
+            extraction_futures = [executor.submit(extract_document_in_worker, pdf_path) for pdf_path, _ in jobs]
+        
+        results = [None] * len(jobs)
+        pending = []  # (job position, chunked document) awaiting embedding
+        
+        def index_pending():
+            """Embed all pending documents' chunks in one call, then index and save each document"""
+            texts = [chunk['content'] for _, document in pending for chunk in document['chunks']]
+            try:
+                embeddings = self._encode_chunk_texts(texts)
+            except Exception as e:
+                logger.error(f"Failed to embed {len(pending)} documents: {e}")
+                for position, _ in pending:
+                    results[position] = e
+                pending.clear()
+                return
+            
+            offset = 0
+            for position, document in pending:
+                count = len(document['chunks'])
+                try:
+                    results[position] = self._index_and_save_document(document, embeddings[offset:offset + count])
+                    logger.info(f"Processed {position + 1}/{len(jobs)}: {document['document_id']}")
+                except Exception as e:
+                    logger.error(f"Failed to index {document['document_id']}: {e}")
+                    results[position] = e
+                offset += count
+            pending.clear()
+        
+        try:
+            for position, ((pdf_path, document_id), future) in enumerate(zip(jobs, extraction_futures)):
+                try:
+                    extracted_data = None
+                    if future is not None:
+                        try:
+                            extracted_data = future.result()
+                        except Exception as e:
+                            logger.warning(f"Parallel extraction failed for {pdf_path}, retrying in-process: {e}")
+                    pending.append((position, self._chunk_document(pdf_path, document_id, extracted_data)))
+                except Exception as e:
+                    logger.error(f"Failed to process {pdf_path}: {e}")
+                    results[position] = e
+                    continue
+                
+                if sum(len(document['chunks']) for _, document in pending) >= _ENCODE_GROUP_CHUNKS:
+                    index_pending()
+            
+            if pending:
+                index_pending()
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        
+        return results
+    
+    def _create_enhanced_chunks(self, structure: Dict, font_analysis: Dict, markdown: _MarkdownSource) -> List[Dict]:
         """Create enhanced chunks with multi-level hierarchy and page awareness"""
         chunks = []
         seen_titles = set()  # Track processed titles to avoid duplicates
@@ -165,7 +472,7 @@ class EnhancedPDFProcessor:
                     self._is_toc_like_section(section_title)):
                     continue
 
-                section_chunk = self._create_enhanced_section_chunk(section, chapter, font_analysis)
+                section_chunk = self._create_enhanced_section_chunk(section, chapter, font_analysis, markdown)
                 chunks.append(section_chunk)
                 seen_titles.add(normalized_title)
 
@@ -180,9 +487,9 @@ class EnhancedPDFProcessor:
         """Normalize section title for deduplication"""
         normalized = title.lower().strip()
         # Remove leading bullets, dashes, numbers
-        normalized = re.sub(r'^[-•\d\.\s]+', '', normalized)
+        normalized = _TITLE_LEADER_RE.sub('', normalized)
         # Normalize whitespace
-        normalized = re.sub(r'\s+', ' ', normalized).strip()
+        normalized = _WHITESPACE_RE.sub(' ', normalized).strip()
         return normalized
 
     def _is_toc_like_section(self, title: str) -> bool:
@@ -191,93 +498,45 @@ class EnhancedPDFProcessor:
             return True
         
         # TOC-like patterns
-        toc_patterns = [
-            r'^\s*[-•]\s*',  # Bullet points
-            r'\.{3,}',       # Dot leaders
-            r'\s+\d+\s*$',   # Ending with page numbers
-        ]
-        for pattern in toc_patterns:
-            if re.search(pattern, title):
-                return True
+        if any(pattern.search(title) for pattern in _TOC_PATTERNS):
+            return True
         
         # CRITICAL FIX: Detect bullet point references that mention other sections
         # These should not be treated as standalone sections
-        bullet_reference_patterns = [
-            r'^-\s+.*installing on.*',
-            r'^-\s+.*complete the steps.*',
-            r'^-\s+.*described in.*',
-            r'^-\s+.*as described in.*',
-            r'^-\s+.*refer to.*',
-            r'^-\s+.*see.*',
-        ]
-        
-        for pattern in bullet_reference_patterns:
-            if re.search(pattern, title, re.IGNORECASE):
-                return True
-                
-        return False
+        return any(pattern.search(title) for pattern in _BULLET_REFERENCE_PATTERNS)
 
     def _split_large_chapter(self, chapter: Dict, font_analysis: Dict) -> List[Dict]:
         """Split large chapters into smaller chunks based on subsections"""
         chunks = []
         content = chapter.get('complete_content', '')
         
-        # Try to split by subsections (16pt and smaller headings)
-        subsection_pattern = r'^#{2,4}\s+(.+)$'
+        # Try to split by subsections (16pt and smaller headings): one scan for the heading lines,
+        # then each subsection is the slice from its heading up to the next one
         lines = content.split('\n')
-        current_subsection = []
-        current_title = "Introduction"
+        boundaries = [(i, match.group(1)) for i, match in enumerate(map(_SUBSECTION_HEADING_RE.match, lines))
+                      if match]
         
-        for line in lines:
-            if re.match(subsection_pattern, line):
-                # Save previous subsection if it exists
-                if current_subsection:
-                    chunk = self._create_subsection_chunk(
-                        current_subsection, current_title, chapter, font_analysis
-                    )
-                    chunks.append(chunk)
-                
-                # Start new subsection
-                current_title = re.match(subsection_pattern, line).group(1)
-                current_subsection = [line]
-            else:
-                current_subsection.append(line)
+        # Lines before the first heading form an introduction
+        if not boundaries or boundaries[0][0] > 0:
+            boundaries.insert(0, (0, "Introduction"))
         
-        # Save final subsection
-        if current_subsection:
-            chunk = self._create_subsection_chunk(
-                current_subsection, current_title, chapter, font_analysis
-            )
+        ends = [start for start, _ in boundaries[1:]] + [len(lines)]
+        for (start, title), end in zip(boundaries, ends):
+            chunk = self._create_subsection_chunk(lines[start:end], title, chapter, font_analysis)
             chunks.append(chunk)
         
         return chunks
     
-    def _extract_complete_section_from_markdown(self, section_title: str, parent_chapter: Dict) -> str:
+    def _extract_complete_section_from_markdown(self, section_title: str, parent_chapter: Dict,
+                                                markdown: _MarkdownSource) -> str:
         """Extract complete section content from full markdown text with improved boundary detection"""
-        if not hasattr(self, '_full_markdown_content'):
-            return ""
-
-        # Get the full markdown content
-        full_content = getattr(self, '_full_markdown_content', '')
-        if not full_content:
+        if not markdown.content:
             return ""
 
-        lines = full_content.split('\n')
-        section_start = -1
-        section_end = len(lines)
-
-        # Find the start of our section
-        for i, line in enumerate(lines):
-            line_strip = line.strip()
-            # Look for the section heading (could be ## or ###, etc.)
-            if line_strip.startswith('#') and section_title.lower() in line_strip.lower():
-                # More precise matching
-                import re
-                heading_match = re.match(r'^#+\s*(.+)', line_strip)
-                if heading_match and heading_match.group(1).strip().lower() == section_title.lower():
-                    section_start = i
-                    break
+        lines = markdown.lines
 
+        # Find the start of our section (the first heading, ## or ###, etc., with exactly this title)
+        section_start = markdown.heading_lines.get(section_title.lower(), -1)
         if section_start == -1:
             return ""
 
@@ -290,11 +549,20 @@ class EnhancedPDFProcessor:
 
         return section_content
 
+    def _index_markdown_headings(self, lines: List[str]) -> Dict[str, int]:
+        """Map each lowercased markdown heading text to the index of the first line with that heading"""
+        heading_lines = {}
+        for i, line in enumerate(lines):
+            line_strip = line.strip()
+            if line_strip.startswith('#'):
+                heading_match = _HEADING_TEXT_RE.match(line_strip)
+                if heading_match:
+                    heading_lines.setdefault(heading_match.group(1).strip().lower(), i)
+        return heading_lines
+
     def _find_section_end_boundary(self, lines: List[str], section_start: int, section_title: str) -> int:
         """Find the precise end boundary of a section using multiple heuristics"""
-        import re
-
-        start_level = len(re.match(r'^#+', lines[section_start]).group(0))
+        start_level = len(_HEADING_LEVEL_RE.match(lines[section_start]).group(0))
         section_end = len(lines)
 
         # Use configurable section boundary patterns
@@ -316,6 +584,9 @@ class EnhancedPDFProcessor:
             ]
         }
 
+        # Avoid extremely long sections (safety net)
+        max_lines = self.chunking_config.max_section_lines if self.chunking_config else 100
+
         content_lines_found = 0
         last_content_line = section_start
         table_content_found = False
@@ -323,9 +594,10 @@ class EnhancedPDFProcessor:
         for i in range(section_start + 1, len(lines)):
             line = lines[i]
             line_strip = line.strip()
+            is_heading = line_strip.startswith('#')
 
             # Track content to avoid stopping too early
-            if line_strip and not line_strip.startswith('#'):
+            if line_strip and not is_heading:
                 content_lines_found += 1
                 last_content_line = i
                 
@@ -335,9 +607,8 @@ class EnhancedPDFProcessor:
                                          'UNIX' in line_strip or 'Command' in line_strip):
                     table_content_found = True
 
-            if line_strip.startswith('#'):
-                current_level = len(re.match(r'^#+', line_strip).group(0))
-                heading_text = re.sub(r'^#+\s*', '', line_strip)
+            if is_heading:
+                current_level = len(_HEADING_LEVEL_RE.match(line_strip).group(0))
 
                 # Check for strong boundaries (always stop)
                 for pattern in boundary_patterns['strong_boundaries']:
@@ -366,25 +637,20 @@ class EnhancedPDFProcessor:
             # CRITICAL FIX: Don't stop at "Steps" headings - they are subheadings within the same section
             # Steps headings should be included as part of the current section content
             # Only stop if Steps appears as a major section (same level as the starting section)
-            if (line_strip.startswith('#') and 
-                re.match(r'^#+\s+Steps\s*$', line_strip) and 
+            if (is_heading and 
+                _STEPS_HEADING_RE.match(line_strip) and 
                 current_level <= start_level and 
                 content_lines_found >= 10):  # Only stop if we have substantial content
                 return i
 
             # CRITICAL FIX: Stop at new major sections that should be separate chunks
-            # Look for common section patterns that indicate a new topic
-            major_section_patterns = [
-                r'^#+\s+(?:Verifying|Troubleshooting|Logging|Connecting|Editing|Updating)',
-                r'^#+\s+(?:Operating system|Command|Option|Description)',
-                r'^#+\s+(?:Prerequisites|Steps|About this task)'
-            ]
-            
-            for pattern in major_section_patterns:
-                if re.match(pattern, line_strip, re.IGNORECASE):
-                    # Only stop if we have substantial content and this looks like a new major section
-                    if content_lines_found >= 10 or (table_content_found and content_lines_found >= 5):
-                        return i
+            # Look for common section patterns that indicate a new topic (all are headings)
+            if is_heading:
+                for pattern in _MAJOR_SECTION_PATTERNS:
+                    if pattern.match(line_strip):
+                        # Only stop if we have substantial content and this looks like a new major section
+                        if content_lines_found >= 10 or (table_content_found and content_lines_found >= 5):
+                            return i
 
             # CRITICAL FIX: Detect and ignore bullet points that contain section references
             # These should not be treated as new sections
@@ -395,8 +661,7 @@ class EnhancedPDFProcessor:
                 # This is a bullet point reference, not a new section - continue
                 continue
 
-            # Avoid extremely long sections (safety net)
-            max_lines = self.chunking_config.max_section_lines if self.chunking_config else 100
+            # Safety net
             if i > section_start + max_lines:
                 return last_content_line + 1
 
@@ -407,20 +672,21 @@ class EnhancedPDFProcessor:
         if not content:
             return content
 
-        import re
         lines = content.split('\n')
         cleaned_lines = []
+        title_lower = section_title.lower()
         i = 0
 
+        # Single left-to-right pass: a numbered step's look-ahead consumes the lines it absorbs
         while i < len(lines):
             line = lines[i]
             line_strip = line.strip()
 
             # Skip lines that are exact duplicates of the section title
-            if line_strip.startswith('#') and section_title.lower() in line_strip.lower():
+            if line_strip.startswith('#') and title_lower in line_strip.lower():
                 # Check if this is an exact title match
-                heading_match = re.match(r'^#+\s*(.+)', line_strip)
-                if heading_match and heading_match.group(1).strip().lower() == section_title.lower():
+                heading_match = _HEADING_TEXT_RE.match(line_strip)
+                if heading_match and heading_match.group(1).strip().lower() == title_lower:
                     i += 1
                     continue  # Skip this redundant title
 
@@ -439,7 +705,7 @@ class EnhancedPDFProcessor:
                 continue
 
             # Fix procedure list formatting
-            if re.match(r'^\d+\.\s', line_strip):
+            if _NUMBERED_ITEM_RE.match(line_strip):
                 # This is a numbered list item
                 cleaned_lines.append(line)
 
@@ -450,20 +716,21 @@ class EnhancedPDFProcessor:
                 # Look for NOTE that should be part of this step (but not standalone numbered NOTEs)
                 if j < len(lines):
                     next_line = lines[j].strip()
-                    next_num_match = re.match(r'^(\d+)\.\s+(NOTE:.*)', next_line)
+                    next_num_match = _NUMBERED_NOTE_RE.match(next_line)
                     if next_num_match:
                         current_step_num = int(line_strip.split('.')[0])
                         note_step_num = int(next_num_match.group(1))
                         note_content = next_num_match.group(2)
+                        note_lower = note_content.lower()
 
                         # Only treat as sub-note if it's not a consecutive numbered step
                         # AND if the note content seems to belong to the current step
                         is_consecutive_step = (note_step_num == current_step_num + 1)
                         is_standalone_note = (
                             is_consecutive_step and
-                            ('multiple' in note_content.lower() or
-                             'can be' in note_content.lower() or
-                             'recommends' in note_content.lower() or
+                            ('multiple' in note_lower or
+                             'can be' in note_lower or
+                             'recommends' in note_lower or
                              len(note_content) > 50)  # Substantial standalone content
                         )
 
@@ -479,12 +746,12 @@ class EnhancedPDFProcessor:
                     next_line = lines[j].strip()
 
                     # Check if this looks like a file path entry that was incorrectly numbered
-                    if (re.match(r'^\d+\.\s+…/', next_line) or
-                        (re.match(r'^\d+\.\s+', next_line) and 'conf/' in next_line) or
-                        (re.match(r'^\d+\.\s+', next_line) and next_line.endswith('.xml'))):
+                    if (_NUMBERED_ELIDED_PATH_RE.match(next_line) or
+                        (_NUMBER_PREFIX_RE.match(next_line) and
+                         ('conf/' in next_line or next_line.endswith('.xml')))):
 
                         # Convert numbered file path to bullet point
-                        file_content = re.sub(r'^\d+\.\s+', '', next_line)
+                        file_content = _NUMBER_PREFIX_RE.sub('', next_line)
                         file_path_lines.append(f'   - {file_content}')  # Indent as sub-item
                         j += 1
                     else:
@@ -507,10 +774,10 @@ class EnhancedPDFProcessor:
         cleaned_content = '\n'.join(cleaned_lines)
 
         # Remove multiple consecutive empty lines
-        cleaned_content = re.sub(r'\n\n\n+', '\n\n', cleaned_content)
+        cleaned_content = _EXCESS_BLANK_LINES_RE.sub('\n\n', cleaned_content)
 
         # Fix NOTE formatting - ensure NOTE: is properly formatted
-        cleaned_content = re.sub(r'^(\d+\.)\s+(NOTE:)', r'\1 **\2**', cleaned_content, flags=re.MULTILINE)
+        cleaned_content = _NUMBERED_NOTE_LABEL_RE.sub(r'\1 **\2**', cleaned_content)
 
         # Fix numbering sequence: renumber steps after NOTEs are processed
         cleaned_content = self._fix_step_numbering(cleaned_content)
@@ -519,8 +786,6 @@ class EnhancedPDFProcessor:
 
     def _fix_step_numbering(self, content: str) -> str:
         """Fix numbering sequence by renumbering steps after NOTEs are processed"""
-        import re
-
         lines = content.split('\n')
         fixed_lines = []
         step_counter = 1
@@ -529,7 +794,7 @@ class EnhancedPDFProcessor:
             line_strip = line.strip()
 
             # Check if this is a numbered step (but not a NOTE)
-            step_match = re.match(r'^(\d+)\.\s+(?!NOTE:)(.+)', line_strip)
+            step_match = _NUMBERED_STEP_RE.match(line_strip)
             if step_match:
                 # Renumber this step
                 step_content = step_match.group(2)
@@ -544,51 +809,17 @@ class EnhancedPDFProcessor:
 
     def _is_structured_table_line(self, line: str) -> bool:
         """Check if a line is part of a structured table (not TOC overflow)"""
-        import re
-        
         # Look for structured table patterns
-        structured_patterns = [
-            r'^\|.*\|.*\|',  # Multiple columns with pipes
-            r'^\|.*Option.*\|',  # Option column
-            r'^\|.*Description.*\|',  # Description column
-            r'^\|.*Linux.*\|',  # Linux entries
-            r'^\|.*Windows.*\|',  # Windows entries
-            r'^\|.*UNIX.*\|',  # UNIX entries
-            r'^\|.*Command.*\|',  # Command entries
-            r'^\|.*Operating system.*\|',  # Operating system entries
-        ]
-        
-        for pattern in structured_patterns:
-            if re.search(pattern, line, re.IGNORECASE):
-                return True
-                
-        return False
+        return any(pattern.search(line) for pattern in _STRUCTURED_TABLE_PATTERNS)
 
     def _is_table_overflow_line(self, line: str) -> bool:
         """Check if a line contains table overflow where multiple entries are concatenated"""
-        import re
-        # Look for patterns where page numbers are followed by titles without proper line breaks
-        # Example: "...15 Modifying the start order..."
-        patterns = [
-            r'\.{3,}\d+\s+[A-Z][a-z]+',  # Dots followed by page number and title
-            r'\d+\s+[A-Z][a-z]+.*\d+\s*\|',  # Page number, title, then another page number at end
-        ]
-
-        for pattern in patterns:
-            if re.search(pattern, line):
-                return True
-        return False
+        return any(pattern.search(line) for pattern in _TABLE_OVERFLOW_PATTERNS)
 
     def _fix_table_overflow(self, line: str) -> List[str]:
         """Fix table overflow by splitting concatenated entries into separate lines"""
-        import re
-
-        # Pattern to find where entries are concatenated
-        # Look for: "...pagenum Text" where Text starts with capital letter
-        split_pattern = r'(\.{3,}\d+)\s+([A-Z][^|]*?)(?=\s*\d+\s*\||\s*$)'
-
-        # Find all matches
-        matches = list(re.finditer(split_pattern, line))
+        # Find all places where entries are concatenated
+        matches = list(_TABLE_OVERFLOW_SPLIT_RE.finditer(line))
 
         if not matches:
             return [line]  # No overflow detected, return original
@@ -600,7 +831,7 @@ class EnhancedPDFProcessor:
         start_content = line[:matches[0].start()].strip()
         if start_content and start_content != '|':
             # Extract the main entry before overflow
-            main_entry_match = re.search(r'^([^|]*?)(\.{3,}\d+)', start_content)
+            main_entry_match = _TOC_ENTRY_RE.search(start_content)
             if main_entry_match:
                 entry_name = main_entry_match.group(1).strip()
                 page_info = main_entry_match.group(2)
@@ -612,7 +843,7 @@ class EnhancedPDFProcessor:
             entry_title = match.group(2).strip()  # e.g., "Modifying the start order of the vApps"
 
             # Clean up the title to remove any trailing page numbers or pipes
-            entry_title = re.sub(r'\s*\d+\s*\|?\s*$', '', entry_title)
+            entry_title = _TRAILING_PAGE_NUMBER_RE.sub('', entry_title)
 
             if entry_title:
                 fixed_lines.append(f"| {entry_title} {page_dots} |")
@@ -625,9 +856,8 @@ class EnhancedPDFProcessor:
         
         # Add section overview
         if chapter.get('sections'):
-            content += "\n\n## Sections in this chapter:\n"
-            for section in chapter['sections']:
-                content += f"- {section['title']}\n"
+            section_lines = ''.join(f"- {section['title']}\n" for section in chapter['sections'])
+            content += "\n\n## Sections in this chapter:\n" + section_lines
         
         # Determine chunk classification and hierarchy level
         font_size = chapter.get('font_size', 20.0)
@@ -661,7 +891,8 @@ class EnhancedPDFProcessor:
             'extraction_method': 'enhanced_page_aware'
         }
     
-    def _create_enhanced_section_chunk(self, section: Dict, parent_chapter: Dict, font_analysis: Dict) -> Dict:
+    def _create_enhanced_section_chunk(self, section: Dict, parent_chapter: Dict, font_analysis: Dict,
+                                       markdown: _MarkdownSource) -> Dict:
         """Create enhanced section chunk with page awareness"""
         # Start with metadata only - don't duplicate the section title
         content = f"*Chapter: {parent_chapter['title']}*\n"
@@ -671,7 +902,7 @@ class EnhancedPDFProcessor:
         section_content = section.get('complete_content', '')
         if not section_content or len(section_content.strip()) < 100:
             # Try to extract complete section from full markdown
-            section_content = self._extract_complete_section_from_markdown(section['title'], parent_chapter)
+            section_content = self._extract_complete_section_from_markdown(section['title'], parent_chapter, markdown)
 
         # Clean up section content to remove any redundant title headers
         section_content = self._clean_section_content(section_content, section['title'])
@@ -706,7 +937,7 @@ class EnhancedPDFProcessor:
             'has_procedures': has_procedures,
             'is_heading_chunk': True,
             'exact_title_match': section['title'].lower().strip(),
-            'searchable_titles': [section['title'], parent_chapter['title']],
+            'searchable_titles': _unique_titles(section['title'], parent_chapter['title']),
             'extraction_method': 'enhanced_page_aware'
         }
     
@@ -735,7 +966,7 @@ class EnhancedPDFProcessor:
             'has_procedures': self._detect_procedures(content),
             'is_heading_chunk': True,
             'exact_title_match': title.lower().strip(),
-            'searchable_titles': [title, chapter['title']],
+            'searchable_titles': _unique_titles(title, chapter['title']),
             'extraction_method': 'enhanced_page_aware'
         }
     
@@ -744,15 +975,16 @@ class EnhancedPDFProcessor:
         all_chapters = structure['chapters']
         
         # Create comprehensive overview
-        content = "# Document Overview\n\n"
-        content += "This document contains the following chapters:\n\n"
+        content_parts = ["# Document Overview\n\n", "This document contains the following chapters:\n\n"]
         
         for chapter in all_chapters:
-            content += f"## {chapter['title']}\n"
+            content_parts.append(f"## {chapter['title']}\n")
             if chapter.get('sections'):
                 for section in chapter['sections']:
-                    content += f"- {section['title']}\n"
-            content += "\n"
+                    content_parts.append(f"- {section['title']}\n")
+            content_parts.append("\n")
+        
+        content = ''.join(content_parts)
         
         return {
             'content': content,
@@ -773,7 +1005,7 @@ class EnhancedPDFProcessor:
             'has_complete_content': True,
             'is_heading_chunk': True,
             'exact_title_match': 'document overview',
-            'searchable_titles': ['Document Overview'] + [ch['title'] for ch in all_chapters],
+            'searchable_titles': _unique_titles('Document Overview', *(ch['title'] for ch in all_chapters)),
             'extraction_method': 'enhanced_page_aware'
         }
     
@@ -839,25 +1071,8 @@ class EnhancedPDFProcessor:
             # Default to section level for unknown font sizes to avoid chapter misclassification
             return 'section_standard'
 
-        # Find the best match in font hierarchy
-        for chunk_type, properties in self.font_hierarchy.items():
-            size_min, size_max = properties['size_range']
-            if size_min <= font_size <= size_max:
-                return chunk_type
-
-        # Fallback logic based on font size ranges
-        if font_size >= 22:
-            return 'document_title'
-        elif font_size >= 20:
-            return 'chapter_major'
-        elif font_size >= 16:
-            return 'section_standard'
-        elif font_size >= 11.5:
-            return 'subsection_minor'
-        elif font_size >= 10:
-            return 'table_figure'
-        else:
-            return 'body_text'
+        # Find the font hierarchy class by size
+        return _FONT_SIZE_CLASSES[bisect_right(_FONT_SIZE_BOUNDS, font_size)]
 
     def _validate_and_fix_structure(self, chunks: List[Dict], structure: Dict) -> List[Dict]:
         """Validate and fix structural problems in chunks"""
@@ -866,6 +1081,11 @@ class EnhancedPDFProcessor:
         fixed_chunks = []
         problematic_chapters = []
 
+        # Title -> chapter lookup built once (first chapter wins, as with the previous linear scan)
+        chapters_by_title = {}
+        for ch in structure.get('chapters', []):
+            chapters_by_title.setdefault(ch.get('title', ''), ch)
+
         for chunk in chunks:
             # Check for problematic chapters (like "Add new VMware vCenter")
             if (chunk.get('chunk_type') == 'complete_chapter' and
@@ -873,12 +1093,7 @@ class EnhancedPDFProcessor:
 
                 # Count sections in the original structure
                 chapter_title = chunk.get('title', '')
-                original_chapter = None
-
-                for ch in structure.get('chapters', []):
-                    if ch.get('title', '') == chapter_title:
-                        original_chapter = ch
-                        break
+                original_chapter = chapters_by_title.get(chapter_title)
 
                 if original_chapter:
                     section_count = len(original_chapter.get('sections', []))
@@ -919,70 +1134,62 @@ class EnhancedPDFProcessor:
     
     def _detect_procedures(self, content: str) -> bool:
         """Detect if content contains step-by-step procedures"""
-        procedure_patterns = [
-            r'^\d+\.\s+\w+',  # Numbered steps
-            r'Step \d+',      # Step indicators
-            r'Follow these steps',  # Procedure indicators
-            r'To \w+.*:$',    # Action instructions
-        ]
-        
-        for pattern in procedure_patterns:
-            if re.search(pattern, content, re.MULTILINE | re.IGNORECASE):
-                return True
-        return False
+        # Most body text has none of the keywords, so reject it before the multiline regex scans
+        content_lower = content.lower()
+        if not any(keyword in content_lower for keyword in _PROCEDURE_KEYWORDS) and not _DIGIT_DOT_RE.search(content):
+            return False
+        return any(pattern.search(content) for pattern in _PROCEDURE_PATTERNS)
     
     def _analyze_chunk_types(self, chunks: List[Dict]) -> Dict[str, int]:
         """Analyze distribution of chunk types"""
-        type_counts = {}
-        for chunk in chunks:
-            chunk_type = chunk.get('chunk_type', 'unknown')
-            type_counts[chunk_type] = type_counts.get(chunk_type, 0) + 1
-        return type_counts
+        return dict(Counter(chunk.get('chunk_type', 'unknown') for chunk in chunks))
     
-    def _create_vector_index(self, chunks: List[Dict]) -> Dict[str, Any]:
-        """Create vector index from enhanced chunks"""
-        logger.info(f"Creating vector index for {len(chunks)} enhanced chunks")
+    def _encode_chunk_texts(self, texts: List[str]) -> np.ndarray:
+        """Embed chunk texts as L2-normalized float32 rows, in input order"""
+        # Identical texts (e.g. a short chapter and its only section) are encoded once and the row reused
+        unique_rows: Dict[str, int] = {}
+        inverse = np.fromiter((unique_rows.setdefault(text, len(unique_rows)) for text in texts),
+                              dtype=np.int64, count=len(texts))
+        if len(unique_rows) < len(texts):
+            logger.info(f"Encoding {len(unique_rows)} unique texts for {len(texts)} chunks")
+            return self._encode_chunk_texts(list(unique_rows))[inverse]
         
-        # Extract text content for embedding
-        texts = [chunk['content'] for chunk in chunks]
+        # Fill one preallocated array slice by slice, so the encoder's output (fp16 on GPU) and its
+        # float32 copy never both exist for the whole corpus at once
+        embeddings = np.empty((len(texts), self.model.get_sentence_embedding_dimension()), dtype='float32')
         
-        # Generate embeddings
-        embeddings = self.model.encode(texts, show_progress_bar=True)
+        # encode() only length-sorts within one call, so order the whole corpus by length first: every
+        # slice (and batch) then holds texts of similar length and pads little; rows are scattered back
+        order = np.argsort(np.fromiter(map(len, texts), dtype=np.int64, count=len(texts)), kind='stable')
         
-        # Normalize embeddings
-        faiss.normalize_L2(embeddings)
+        for start in range(0, len(texts), _ENCODE_SLICE_TEXTS):
+            rows = order[start:start + _ENCODE_SLICE_TEXTS]
+            # Normalized per batch while still on the model's device
+            embeddings[rows] = self.model.encode(
+                [texts[i] for i in rows], batch_size=self.encode_batch_size,
+                convert_to_numpy=True, normalize_embeddings=True, show_progress_bar=self.verbose
+            )
         
-        # Create FAISS index
-        dimension = embeddings.shape[1]
-        index = faiss.IndexFlatIP(dimension)  # Inner product for normalized vectors
-        index.add(embeddings.astype('float32'))
+        # fp16 rows are only unit length to half precision; renormalize after the float32 cast
+        if self._half_precision:
+            faiss.normalize_L2(embeddings)
+        return embeddings
+    
+    def _create_vector_index(self, chunks: List[Dict], embeddings: Optional[np.ndarray] = None) -> Dict[str, Any]:
+        """Create vector index from enhanced chunks (embeddings: precomputed, normalized, one row per chunk)"""
+        logger.info(f"Creating vector index for {len(chunks)} enhanced chunks")
         
-        # Prepare enhanced metadata
-        metadata = []
-        for chunk in chunks:
-            metadata.append({
-                'title': chunk['title'],
-                'chunk_type': chunk['chunk_type'],
-                'chunk_classification': chunk.get('chunk_classification', 'unknown'),
-                'hierarchy_level': chunk['hierarchy_level'],
-                'font_size': chunk.get('font_size', 0),
-                'is_bold': chunk.get('is_bold', False),
-                'heading_level': chunk.get('heading_level', 0),
-                'page_start': chunk.get('page_start', 1),
-                'page_end': chunk.get('page_end', 1),
-                'page_count': chunk.get('page_count', 1),
-                'spans_multiple_pages': chunk.get('spans_multiple_pages', False),
-                'confidence': chunk.get('confidence', 0.5),
-                'has_procedures': chunk.get('has_procedures', False),
-                'is_heading_chunk': chunk.get('is_heading_chunk', False),
-                'exact_title_match': chunk.get('exact_title_match', ''),
-                'extraction_method': chunk.get('extraction_method', 'enhanced_page_aware')
-            })
+        # Generate embeddings unless process_documents already encoded them with other documents
+        if embeddings is None:
+            embeddings = self._encode_chunk_texts([chunk['content'] for chunk in chunks])
+        
+        # Create FAISS index (inner product over normalized vectors)
+        dimension = embeddings.shape[1]
+        index = build_faiss_index(embeddings, self.index_type, self.index_params)
         
+        # Chunk texts and search metadata are derived from the full chunks when the index is loaded
         return {
             'index': index,
-            'metadata': metadata,
-            'chunks': [chunk['content'] for chunk in chunks],
             'enhanced_chunks': chunks,  # Include full chunk data
             'embedding_model': self.model_name,
             'dimension': dimension
@@ -1055,49 +1262,65 @@ class EnhancedPDFProcessor:
 
     def _save_enhanced_data(self, doc_dir: Path, document_id: str, extracted_data: Dict,
                            chunks: List[Dict], hybrid_metadata: Optional[Dict] = None,
-                           quality_report: Optional[Dict] = None):
-        """Save enhanced extracted data and chunks"""
+                           quality_report: Optional[Dict] = None,
+                           chunk_types: Optional[Dict[str, int]] = None):
+        """Save enhanced extracted data and chunks (chunk_types: precomputed _analyze_chunk_types result)"""
+        if chunk_types is None:
+            chunk_types = self._analyze_chunk_types(chunks)
         
-        # Save complete markdown content
-        with open(doc_dir / "complete_content.md", 'w', encoding='utf-8') as f:
-            f.write(extracted_data['full_text'])
+        # Save complete markdown content (only on request; it repeats the whole document text)
+        if self.save_markdown:
+            with open(doc_dir / "complete_content.md", 'w', encoding='utf-8') as f:
+                f.write(extracted_data['full_text'])
         
         # Save enhanced chunks with full metadata
-        with open(doc_dir / "enhanced_chunks_v2.json", 'w', encoding='utf-8') as f:
-            json.dump(chunks, f, indent=2, ensure_ascii=False)
+        _write_json(doc_dir / "enhanced_chunks_v2.json", chunks)
 
         # Save hybrid chunks separately if using hybrid mode
         if hybrid_metadata and hybrid_metadata.get('hybrid_chunking_enabled'):
-            with open(doc_dir / "enhanced_chunks_v3_hybrid.json", 'w', encoding='utf-8') as f:
-                json.dump(chunks, f, indent=2, ensure_ascii=False)
+            _write_json(doc_dir / "enhanced_chunks_v3_hybrid.json", chunks)
         
         # Save font analysis
-        with open(doc_dir / "font_analysis.json", 'w', encoding='utf-8') as f:
-            json.dump(extracted_data['font_analysis'], f, indent=2, ensure_ascii=False)
+        _write_json(doc_dir / "font_analysis.json", extracted_data['font_analysis'])
         
         # Save enhanced structure
-        with open(doc_dir / "enhanced_structure.json", 'w', encoding='utf-8') as f:
-            json.dump(extracted_data['enhanced_structure'], f, indent=2, ensure_ascii=False)
+        _write_json(doc_dir / "enhanced_structure.json", extracted_data['enhanced_structure'])
         
-        # Create chunk analysis summary
+        # Create chunk analysis summary, gathering every distribution in one pass over the chunks
+        small = medium = large = multi_page = procedure_chunks = 0
+        exact_title_matches = []
+        for c in chunks:
+            content_length = c['content_length']
+            if content_length < 2000:
+                small += 1
+            elif content_length < 8000:
+                medium += 1
+            else:
+                large += 1
+            if c.get('spans_multiple_pages', False):
+                multi_page += 1
+            if c.get('has_procedures', False):
+                procedure_chunks += 1
+            if c.get('exact_title_match'):
+                exact_title_matches.append(c['exact_title_match'])
+
         chunk_analysis = {
             'total_chunks': len(chunks),
-            'chunk_types': self._analyze_chunk_types(chunks),
+            'chunk_types': chunk_types,
             'size_distribution': {
-                'small': len([c for c in chunks if c['content_length'] < 2000]),
-                'medium': len([c for c in chunks if 2000 <= c['content_length'] < 8000]),
-                'large': len([c for c in chunks if c['content_length'] >= 8000])
+                'small': small,
+                'medium': medium,
+                'large': large
             },
             'page_distribution': {
-                'single_page': len([c for c in chunks if not c.get('spans_multiple_pages', False)]),
-                'multi_page': len([c for c in chunks if c.get('spans_multiple_pages', False)])
+                'single_page': len(chunks) - multi_page,
+                'multi_page': multi_page
             },
-            'procedure_chunks': len([c for c in chunks if c.get('has_procedures', False)]),
-            'exact_title_matches': [c['exact_title_match'] for c in chunks if c.get('exact_title_match')]
+            'procedure_chunks': procedure_chunks,
+            'exact_title_matches': exact_title_matches
         }
         
-        with open(doc_dir / "chunk_analysis.json", 'w', encoding='utf-8') as f:
-            json.dump(chunk_analysis, f, indent=2, ensure_ascii=False)
+        _write_json(doc_dir / "chunk_analysis.json", chunk_analysis)
         
         # Save processing summary
         summary = {
@@ -1112,8 +1335,7 @@ class EnhancedPDFProcessor:
             'quality_report': quality_report
         }
 
-        with open(doc_dir / "processing_summary_v2.json", 'w', encoding='utf-8') as f:
-            json.dump(summary, f, indent=2, ensure_ascii=False)
+        _write_json(doc_dir / "processing_summary_v2.json", summary)
 
         # Save hybrid-specific summary if applicable
         if hybrid_metadata and hybrid_metadata.get('hybrid_chunking_enabled'):
@@ -1122,8 +1344,7 @@ class EnhancedPDFProcessor:
                 'processing_version': 'v3_hybrid',
                 'hybrid_details': hybrid_metadata
             }
-            with open(doc_dir / "processing_summary_v3_hybrid.json", 'w', encoding='utf-8') as f:
-                json.dump(hybrid_summary, f, indent=2, ensure_ascii=False)
+            _write_json(doc_dir / "processing_summary_v3_hybrid.json", hybrid_summary)
         
         logger.info(f"Enhanced data saved to {doc_dir}")
     
@@ -1136,15 +1357,13 @@ class EnhancedPDFProcessor:
         
         # Save enhanced metadata
         metadata_path = self.index_dir / f"{document_id}_v2_metadata.json"
-        with open(metadata_path, 'w', encoding='utf-8') as f:
-            json.dump({
-                'metadata': vector_data['metadata'],
-                'chunks': vector_data['chunks'],
-                'enhanced_chunks': vector_data['enhanced_chunks'],
-                'embedding_model': vector_data['embedding_model'],
-                'processing_timestamp': datetime.now().isoformat(),
-                'chunk_count': len(vector_data['chunks']),
-                'enhancement_version': '2.0'
-            }, f, indent=2, ensure_ascii=False)
+        # Each chunk is stored once; loaders derive chunk texts and search metadata from enhanced_chunks
+        _write_json(metadata_path, {
+            'enhanced_chunks': vector_data['enhanced_chunks'],
+            'embedding_model': vector_data['embedding_model'],
+            'processing_timestamp': datetime.now().isoformat(),
+            'chunk_count': len(vector_data['enhanced_chunks']),
+            'enhancement_version': '2.1'
+        })
         
         logger.info(f"Enhanced vector indexes saved to {self.index_dir}")
\ No newline at end of file
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Extraction Workers
+Process pool that runs PDF extraction in parallel for the document processors
+"""
+
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any
+
+from .extractor import PDFExtractor
+
+# Per-process extractor used by parallel extraction workers
+_worker_extractor = None
+
+
+def init_extraction_worker():
+    """Keep extraction workers single-threaded so N workers don't each start a machine-sized thread pool"""
+    # Docling's layout and table models run on torch; OpenMP libraries initialized later read the env
+    os.environ['OMP_NUM_THREADS'] = '1'
+    os.environ['TOKENIZERS_PARALLELISM'] = 'false'
+    import torch
+    torch.set_num_threads(1)
+
+
+def extract_document_in_worker(pdf_path: str) -> Dict[str, Any]:
+    """Extract a PDF inside a worker process, reusing one extractor per process"""
+    global _worker_extractor
+    if _worker_extractor is None:
+        _worker_extractor = PDFExtractor()
+    return _worker_extractor.extract_document(pdf_path)
+
+
+def create_extraction_pool(max_workers: int) -> ProcessPoolExecutor:
+    """Start a pool of extraction workers.
+
+    Workers are spawned rather than forked: the parent has already loaded the embedding model
+    (possibly holding a CUDA context) and may be running in a server thread, neither of which
+    survives a fork safely.
+    """
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=init_extraction_worker)
@@ -558,6 +558,15 @@ class PDFExtractor:
         chapters = []
         current_chapter = None
 
+        # Content appended to a chapter/section is collected in lists and joined once at the end
+        content_parts = {}
+
+        def append_content(target: Dict, text: str):
+            key = id(target)
+            if key not in content_parts:
+                content_parts[key] = (target, [target['complete_content']])
+            content_parts[key][1].append(text)
+
         # First pass: filter out duplicate sections (keep ones with content)
         filtered_sections = self._filter_duplicate_sections(sections)
 
@@ -612,16 +621,19 @@ class PDFExtractor:
                 else:
                     # If it's content without a heading, append it to the last section or the chapter itself
                     if current_chapter['sections']:
-                        current_chapter['sections'][-1]['complete_content'] += '\n\n' + section['title'] + '\n' + section['complete_content']
+                        append_content(current_chapter['sections'][-1], '\n\n' + section['title'] + '\n' + section['complete_content'])
                         current_chapter['sections'][-1]['content_length'] += len(section['complete_content']) + len(section['title']) + 3
                     else:
-                        current_chapter['complete_content'] += '\n\n' + section['title'] + '\n' + section['complete_content']
+                        append_content(current_chapter, '\n\n' + section['title'] + '\n' + section['complete_content'])
                         current_chapter['content_length'] += len(section['complete_content']) + len(section['title']) + 3
 
         # Add final chapter
         if current_chapter:
             chapters.append(current_chapter)
 
+        for target, parts in content_parts.values():
+            target['complete_content'] = ''.join(parts)
+
         return chapters
 
     def _filter_duplicate_sections(self, sections: List[Dict]) -> List[Dict]:
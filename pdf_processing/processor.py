@@ -6,10 +6,11 @@ Main processor that combines extraction, chunking, and indexing
 
 import os
 import json
+import hashlib
 import logging
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 
 # Import required libraries
 try:
@@ -22,6 +23,8 @@ except ImportError as e:
     raise
 
 from .extractor import PDFExtractor
+from .extraction_workers import create_extraction_pool, extract_document_in_worker
+from .vector_index import DEFAULT_INDEX_TYPE, build_faiss_index
 
 logger = logging.getLogger(__name__)
 
@@ -29,11 +32,16 @@ class PDFProcessor:
     """Main processor for PDF extraction, chunking, and indexing"""
     
     def __init__(self, output_dir: str = "extracted_docs", index_dir: str = "indexes",
-                 model_name: str = 'all-MiniLM-L6-v2', max_chunk_size: int = 8000):
+                 model_name: str = 'all-MiniLM-L6-v2', max_chunk_size: int = 8000,
+                 index_type: str = DEFAULT_INDEX_TYPE, index_params: Optional[Dict[str, Any]] = None,
+                 encode_batch_size: int = 64):
         self.output_dir = Path(output_dir)
         self.index_dir = Path(index_dir)
         self.model_name = model_name
         self.max_chunk_size = max_chunk_size
+        self.index_type = index_type
+        self.index_params = index_params or {}
+        self.encode_batch_size = encode_batch_size
         
         # Create directories
         self.output_dir.mkdir(exist_ok=True)
@@ -42,8 +50,23 @@ class PDFProcessor:
         # Initialize components
         self.extractor = PDFExtractor()
         self.model = SentenceTransformer(model_name)
+        
+        # Half precision halves encoder memory traffic on GPU; embeddings are cast back to float32 for FAISS
+        if self.model.device.type == 'cuda':
+            self.model.half()
+        
+        # Content-hash keyed embedding cache (loaded lazily per index directory). Rows encoded since
+        # the last save are kept as separate arrays after the loaded cache and written out in one go
+        self._embedding_cache = None
+        self._embedding_cache_rows = {}
+        self._embedding_cache_dir = None
+        self._embedding_cache_generation = 0  # Suffix of the cache array file that hash_to_row.json points at
+        self._new_cache_embeddings = []
+        self._cache_live_hashes = set()  # Hashes used since the last save (what a compacting save keeps)
+        self._defer_cache_save = False   # Set while process_documents batches the save
     
-    def process_document(self, pdf_path: str, document_id: str) -> Dict[str, Any]:
+    def process_document(self, pdf_path: str, document_id: str,
+                         extracted_data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Process a single PDF document"""
         logger.info(f"Processing document: {pdf_path} -> {document_id}")
         
@@ -51,8 +74,9 @@ class PDFProcessor:
         doc_dir = self.output_dir / document_id
         doc_dir.mkdir(exist_ok=True)
         
-        # Extract with hybrid method
-        extracted_data = self.extractor.extract_document(pdf_path)
+        # Extract with hybrid method (unless already extracted by a worker)
+        if extracted_data is None:
+            extracted_data = self.extractor.extract_document(pdf_path)
         
         logger.info(f"Extracted content length: {extracted_data['content_length']} characters")
         logger.info(f"Found {len(extracted_data['enhanced_structure']['chapters'])} chapters")
@@ -205,9 +229,8 @@ class PDFProcessor:
         
         # Add section overview if available
         if chapter.get('sections'):
-            content += "\n\n## Sections in this chapter:\n"
-            for section in chapter['sections']:
-                content += f"- {section['title']}\n"
+            section_lines = ''.join(f"- {section['title']}\n" for section in chapter['sections'])
+            content += "\n\n## Sections in this chapter:\n" + section_lines
         
         return {
             'content': content,
@@ -278,42 +301,210 @@ class PDFProcessor:
         # Extract text content for embedding
         texts = [chunk['content'] for chunk in chunks]
         
-        # Generate embeddings
-        embeddings = self.model.encode(texts, show_progress_bar=True)
+        # Generate embeddings (only chunks not already in the cache are encoded)
+        embeddings = self._encode_with_cache(texts)
         
         # Normalize embeddings
         faiss.normalize_L2(embeddings)
         
-        # Create FAISS index
+        # Create FAISS index (inner product over normalized vectors)
         dimension = embeddings.shape[1]
-        index = faiss.IndexFlatIP(dimension)  # Inner product for normalized vectors
-        index.add(embeddings.astype('float32'))
+        index = build_faiss_index(embeddings, self.index_type, self.index_params)
         
         # Prepare metadata
-        metadata = []
-        for chunk in chunks:
-            metadata.append({
-                'title': chunk['title'],
-                'chunk_type': chunk['chunk_type'],
-                'hierarchy_level': chunk['hierarchy_level'],
-                'font_size': chunk.get('font_size', 0),
-                'is_bold': chunk.get('is_bold', False),
-                'heading_level': chunk.get('heading_level', 0),
-                'page': chunk.get('page', 1),
-                'primary_page': chunk.get('primary_page', 1),
-                'confidence': chunk.get('confidence', 0.5),
-                'is_heading_chunk': chunk.get('is_heading_chunk', False),
-                'extraction_method': chunk.get('extraction_method', 'unknown')
-            })
+        metadata = [{
+            'title': chunk['title'],
+            'chunk_type': chunk['chunk_type'],
+            'hierarchy_level': chunk['hierarchy_level'],
+            'font_size': chunk.get('font_size', 0),
+            'is_bold': chunk.get('is_bold', False),
+            'heading_level': chunk.get('heading_level', 0),
+            'page': chunk.get('page', 1),
+            'primary_page': chunk.get('primary_page', 1),
+            'confidence': chunk.get('confidence', 0.5),
+            'is_heading_chunk': chunk.get('is_heading_chunk', False),
+            'extraction_method': chunk.get('extraction_method', 'unknown')
+        } for chunk in chunks]
         
         return {
             'index': index,
             'metadata': metadata,
-            'chunks': [chunk['content'] for chunk in chunks],
+            'chunks': texts,  # Same content list that was embedded
             'embedding_model': self.model_name,
             'dimension': dimension
         }
     
+    def _chunk_hash(self, text: str) -> str:
+        """Stable content hash used as the embedding cache key"""
+        return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+    
+    def _load_embedding_cache(self):
+        """Load the embedding cache stored alongside the indexes"""
+        self._embedding_cache = None
+        self._embedding_cache_rows = {}
+        self._embedding_cache_dir = self.index_dir
+        self._embedding_cache_generation = 0
+        self._new_cache_embeddings = []
+        self._cache_live_hashes = set()
+        
+        rows_path = self.index_dir / "hash_to_row.json"
+        if not rows_path.exists():
+            return
+        
+        try:
+            with open(rows_path, 'r', encoding='utf-8') as f:
+                cache_info = json.load(f)
+            
+            # Embeddings from a different model are not interchangeable
+            if cache_info.get('embedding_model') != self.model_name:
+                logger.info("Embedding cache was built with a different model, ignoring it")
+                return
+            
+            generation = cache_info.get('generation')
+            cache_path = self._embedding_cache_file(generation) if generation is not None else None
+            if cache_path is None or not cache_path.exists():
+                logger.warning("Embedding cache array is missing, ignoring it")
+                return
+            
+            # Memory-map the cache; only the rows that are actually reused get paged in
+            embeddings = np.load(cache_path, mmap_mode='r')
+            rows = cache_info.get('rows', {})
+            if rows and max(rows.values()) >= len(embeddings):
+                logger.warning("Embedding cache is inconsistent, ignoring it")
+                return
+            
+            self._embedding_cache = embeddings.astype('float32', copy=False)
+            self._embedding_cache_rows = rows
+            self._embedding_cache_generation = generation
+            logger.info(f"Loaded embedding cache with {len(rows)} entries")
+        except Exception as e:
+            logger.warning(f"Failed to load embedding cache: {e}")
+    
+    def _embedding_cache_file(self, generation: int) -> Path:
+        """Path of the cache array written by a given save"""
+        return self.index_dir / f"embeddings_cache.{generation}.npy"
+    
+    def _remove_stale_embedding_caches(self):
+        """Delete cache arrays that hash_to_row.json no longer points at"""
+        current_path = self._embedding_cache_file(self._embedding_cache_generation)
+        for path in self.index_dir.glob("embeddings_cache*.npy"):
+            if path != current_path:
+                try:
+                    path.unlink()
+                except OSError as e:
+                    # Still mapped elsewhere (Windows refuses to delete it); retried after the next save
+                    logger.debug(f"Could not remove old embedding cache {path.name}: {e}")
+    
+    def _cache_segments(self) -> List[np.ndarray]:
+        """The loaded cache followed by the arrays encoded since, in row order"""
+        segments = [] if self._embedding_cache is None else [self._embedding_cache]
+        return segments + self._new_cache_embeddings
+    
+    def _cached_embeddings(self, row_ids: List[int]) -> np.ndarray:
+        """Gather cache rows (by global row number) into a fresh float32 array"""
+        segments = self._cache_segments()
+        if not segments:
+            return np.empty((0, self.model.get_sentence_embedding_dimension()), dtype='float32')
+        if len(segments) == 1:
+            return segments[0][row_ids]
+        
+        row_ids = np.asarray(row_ids, dtype=np.int64)
+        starts = np.cumsum([0] + [len(segment) for segment in segments[:-1]])
+        segment_ids = np.searchsorted(starts, row_ids, side='right') - 1
+        embeddings = np.empty((len(row_ids), segments[0].shape[1]), dtype='float32')
+        for segment_id in np.unique(segment_ids):
+            mask = segment_ids == segment_id
+            embeddings[mask] = segments[segment_id][row_ids[mask] - starts[segment_id]]
+        return embeddings
+    
+    def _save_embedding_cache(self, compact: bool = False):
+        """Persist the embedding cache so later re-indexing can reuse it.
+        
+        With compact=True only the hashes used since the cache was last saved are kept, which drops
+        rows for chunks that no longer exist; use it after indexing every document.
+        """
+        # Nothing was encoded or reused (e.g. every document failed): keep the cache as it is
+        if compact and not self._cache_live_hashes:
+            compact = False
+        if not self._new_cache_embeddings and not compact:
+            return
+        
+        rows = self._embedding_cache_rows
+        if compact:
+            live_hashes = [text_hash for text_hash in rows if text_hash in self._cache_live_hashes]
+            embeddings = self._cached_embeddings([rows[text_hash] for text_hash in live_hashes])
+            rows = {text_hash: row for row, text_hash in enumerate(live_hashes)}
+            logger.info(f"Compacted embedding cache to {len(rows)} live entries "
+                        f"(dropped {len(self._embedding_cache_rows) - len(rows)})")
+        else:
+            embeddings = np.concatenate(self._cache_segments())
+        
+        # Each save writes a new array file, so the memory-mapped previous one is never overwritten.
+        # hash_to_row.json is swapped in last and names its array, so rows and array always match
+        generation = self._embedding_cache_generation + 1
+        rows_path = self.index_dir / "hash_to_row.json"
+        tmp_rows_path = self.index_dir / "hash_to_row.json.tmp"
+        saved = False
+        try:
+            np.save(self._embedding_cache_file(generation), embeddings)
+            with open(tmp_rows_path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'embedding_model': self.model_name,
+                    'generation': generation,
+                    'rows': rows
+                }, f)
+            os.replace(tmp_rows_path, rows_path)
+            saved = True
+        except Exception as e:
+            logger.warning(f"Failed to save embedding cache: {e}")
+        
+        # Continue from what was written (also correct if writing failed). This drops the reference
+        # to the previous memory map, so its file can be deleted below
+        self._embedding_cache = embeddings
+        self._embedding_cache_rows = rows
+        self._new_cache_embeddings = []
+        self._cache_live_hashes = set()
+        
+        if saved:
+            self._embedding_cache_generation = generation
+            self._remove_stale_embedding_caches()
+    
+    def _encode_with_cache(self, texts: List[str]) -> np.ndarray:
+        """Encode texts, reusing cached embeddings for unchanged chunk content"""
+        if self._embedding_cache_dir != self.index_dir:
+            self._load_embedding_cache()
+        
+        rows = self._embedding_cache_rows
+        hashes = [self._chunk_hash(text) for text in texts]
+        self._cache_live_hashes.update(hashes)
+        
+        # Unique hashes that still need an embedding, in first-seen order
+        new_texts = {}
+        for text_hash, text in zip(hashes, texts):
+            if text_hash not in rows and text_hash not in new_texts:
+                new_texts[text_hash] = text
+        
+        if new_texts:
+            # SentenceTransformer.encode sorts inputs by length internally, so larger batches pad little
+            new_embeddings = self.model.encode(list(new_texts.values()), batch_size=self.encode_batch_size,
+                                               convert_to_numpy=True, show_progress_bar=True)
+            new_embeddings = np.asarray(new_embeddings, dtype='float32')
+            
+            # Appended as its own segment: the existing cache is not copied until it is saved
+            start_row = sum(len(segment) for segment in self._cache_segments())
+            self._new_cache_embeddings.append(new_embeddings)
+            for offset, text_hash in enumerate(new_texts):
+                rows[text_hash] = start_row + offset
+            
+            # process_documents saves once for the whole batch
+            if not self._defer_cache_save:
+                self._save_embedding_cache()
+        
+        logger.info(f"Embeddings: {len(texts) - len(new_texts)} reused from cache, {len(new_texts)} newly encoded")
+        
+        # Gathering returns a fresh array, so normalizing it leaves the cache untouched
+        return self._cached_embeddings([rows[text_hash] for text_hash in hashes])
+    
     def _save_data(self, doc_dir: Path, document_id: str, extracted_data: Dict, chunks: List[Dict]):
         """Save extracted data and chunks"""
         
@@ -404,11 +595,57 @@ class PDFProcessor:
                 'embedding_model': vector_data['embedding_model'],
                 'processing_timestamp': datetime.now().isoformat(),
                 'chunk_count': len(vector_data['chunks'])
-            }, f, indent=2, ensure_ascii=False)
+            }, f, ensure_ascii=False, separators=(',', ':'))  # Compact: read at every searcher load
         
         logger.info(f"Vector indexes saved to {self.index_dir}")
     
-    def process_batch(self, pdf_directory: str, output_dir: str = None, index_dir: str = None) -> List[Dict[str, Any]]:
+    def process_documents(self, jobs: List[Tuple[str, str]], max_workers: Optional[int] = None,
+                          compact_cache: bool = False) -> List[Any]:
+        """Process several (pdf_path, document_id) jobs, extracting PDFs in parallel processes.
+        
+        Extraction (Docling + font analysis) is the expensive, independent step and runs in a
+        process pool; chunking, embedding and saving stay in this process so the embedding
+        model and cache are shared. The embedding cache is saved once, after the last job;
+        compact_cache drops cached rows no job used (pass it when the jobs cover every document).
+        Returns, per job, the process_document result or the exception raised while processing it.
+        """
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        max_workers = max(1, min(max_workers, len(jobs)))
+        
+        if max_workers == 1:
+            extraction_futures = [None] * len(jobs)
+            executor = None
+        else:
+            logger.info(f"Extracting {len(jobs)} documents with {max_workers} worker processes")
+            executor = create_extraction_pool(max_workers)
+            extraction_futures = [executor.submit(extract_document_in_worker, pdf_path) for pdf_path, _ in jobs]
+        
+        results = []
+        self._defer_cache_save = True
+        try:
+            for (pdf_path, document_id), future in zip(jobs, extraction_futures):
+                try:
+                    extracted_data = None
+                    if future is not None:
+                        try:
+                            extracted_data = future.result()
+                        except Exception as e:
+                            # Fall back to extracting in this process (e.g. worker crash or unpicklable result)
+                            logger.warning(f"Parallel extraction failed for {pdf_path}, retrying in-process: {e}")
+                    results.append(self.process_document(pdf_path, document_id, extracted_data))
+                except Exception as e:
+                    results.append(e)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+            self._defer_cache_save = False
+            self._save_embedding_cache(compact=compact_cache)
+        
+        return results
+    
+    def process_batch(self, pdf_directory: str, output_dir: str = None, index_dir: str = None,
+                      max_workers: Optional[int] = None) -> List[Dict[str, Any]]:
         """Process all PDFs in a directory"""
         pdf_dir = Path(pdf_directory)
         if not pdf_dir.exists():
@@ -427,21 +664,23 @@ class PDFProcessor:
         if not pdf_files:
             raise ValueError(f"No PDF files found in {pdf_directory}")
         
+        # Create document IDs from filenames
+        jobs = [(str(pdf_file), pdf_file.stem.replace(' ', '_').replace('-', '_')) for pdf_file in pdf_files]
+        
+        # Every document is reindexed, so cached embeddings no chunk uses anymore can be dropped
+        processed = self.process_documents(jobs, max_workers, compact_cache=True)
+        
         results = []
-        for pdf_file in pdf_files:
-            # Create document ID from filename
-            document_id = pdf_file.stem.replace(' ', '_').replace('-', '_')
-            
-            try:
-                result = self.process_document(str(pdf_file), document_id)
-                results.append(result)
-                logger.info(f"Successfully processed: {pdf_file.name}")
-            except Exception as e:
-                logger.error(f"Failed to process {pdf_file.name}: {e}")
+        for pdf_file, (_, document_id), result in zip(pdf_files, jobs, processed):
+            if isinstance(result, Exception):
+                logger.error(f"Failed to process {pdf_file.name}: {result}")
                 results.append({
                     'document_id': document_id,
                     'status': 'failed',
-                    'error': str(e)
+                    'error': str(result)
                 })
+            else:
+                results.append(result)
+                logger.info(f"Successfully processed: {pdf_file.name}")
         
         return results
@@ -23,16 +23,19 @@ except ImportError as e:
     print("Install with: pip install sentence-transformers faiss-cpu numpy")
     raise
 
+from .vector_index import configure_search_params, read_faiss_index
+
 logger = logging.getLogger(__name__)
 
 class PDFSearcher:
     """Enhanced searcher with font-based heading priority"""
     
     def __init__(self, index_dir: str = "indexes", extracted_docs_dir: str = "extracted_docs",
-                 model_name: str = 'all-MiniLM-L6-v2'):
+                 model_name: str = 'all-MiniLM-L6-v2', index_params: Optional[Dict[str, Any]] = None):
         self.index_dir = Path(index_dir)
         self.extracted_docs_dir = Path(extracted_docs_dir)
         self.model_name = model_name
+        self.index_params = index_params or {}
         
         # Load embedding model
         logger.info(f"Loading embedding model: {model_name}")
@@ -101,7 +104,8 @@ class PDFSearcher:
         for doc_id, doc_info in self.documents.items():
             try:
                 # Load FAISS index
-                faiss_index = faiss.read_index(str(doc_info['faiss_file']))
+                faiss_index = read_faiss_index(doc_info['faiss_file'])
+                configure_search_params(faiss_index, self.index_params)
                 
                 # Load metadata
                 with open(doc_info['metadata_file'], 'r', encoding='utf-8') as f:
@@ -300,12 +304,11 @@ class PDFSearcher:
             faiss_index = index_data['faiss_index']
             
             # Generate embedding for the title
-            title_embedding = self.model.encode([title])
-            faiss.normalize_L2(title_embedding)
+            title_embedding = self._encode_normalized_query(title)
             
             # Search for semantically similar content
             scores, indices = faiss_index.search(
-                title_embedding.astype('float32'), 
+                title_embedding, 
                 min(5, faiss_index.ntotal)
             )
             
@@ -456,6 +459,9 @@ class PDFSearcher:
         # Search in each document
         search_docs = document_ids if document_ids else list(self.indexes.keys())
         
+        # Encode and L2-normalize the query once; every document index scores it by inner product (cosine)
+        query_embedding = self._encode_normalized_query(query)
+        
         for doc_id in search_docs:
             if doc_id not in self.indexes:
                 continue
@@ -471,7 +477,7 @@ class PDFSearcher:
             
             # 2. Semantic search in chunks
             semantic_matches = self._search_semantic_chunks(
-                query, doc_id, top_k * 2
+                query_embedding, doc_id, top_k * 2
             )
             doc_results.extend(semantic_matches)
             
@@ -611,18 +617,20 @@ class PDFSearcher:
         
         return results
     
-    def _search_semantic_chunks(self, query: str, doc_id: str, top_k: int) -> List[Dict]:
+    def _encode_normalized_query(self, text: str) -> np.ndarray:
+        """Encode text as a contiguous float32, L2-normalized (1, d) query matrix"""
+        query_embedding = np.ascontiguousarray(self.model.encode([text]), dtype='float32')
+        faiss.normalize_L2(query_embedding)
+        return query_embedding
+    
+    def _search_semantic_chunks(self, query_embedding: np.ndarray, doc_id: str, top_k: int) -> List[Dict]:
         """Search in vector-indexed chunks"""
         index_data = self.indexes[doc_id]
         faiss_index = index_data['faiss_index']
         
-        # Generate query embedding
-        query_embedding = self.model.encode([query])
-        faiss.normalize_L2(query_embedding)
-        
         # Search
         scores, indices = faiss_index.search(
-            query_embedding.astype('float32'),
+            query_embedding,
             min(top_k, faiss_index.ntotal)
         )
         
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Vector Index Builder
+Builds and tunes FAISS indexes over normalized chunk embeddings
+"""
+
+import logging
+from typing import Dict, Any, Optional
+
+# Import required libraries
+try:
+    import faiss
+    import numpy as np
+except ImportError as e:
+    print(f"Missing required library: {e}")
+    print("Install with: pip install faiss-cpu numpy")
+    raise
+
+logger = logging.getLogger(__name__)
+
+# Index type used when neither the config (faiss_index_type) nor the caller picks one
+DEFAULT_INDEX_TYPE = 'flat'
+
+# Supported index types (all use inner product on L2-normalized vectors, i.e. cosine similarity)
+INDEX_TYPES = ('flat', 'hnsw', 'ivfflat', 'ivfpq', 'sq8', 'hnsw_sq8', 'sq_fp16', 'hnsw_sq_fp16')
+
+# PQ codebooks use 8 bits per sub-quantizer, so training needs at least 256 vectors
+_PQ_MIN_TRAINING_VECTORS = 256
+
+# Below this many vectors a brute-force scan beats walking an HNSW graph
+_HNSW_MIN_VECTORS = 1000
+
+# Exact-scan index each HNSW type falls back to for small corpora
+_HNSW_FALLBACKS = {'hnsw': 'flat', 'hnsw_sq8': 'sq8', 'hnsw_sq_fp16': 'sq_fp16'}
+
+
+def index_params_from_config(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Collect FAISS index settings from the application config"""
+    return {
+        'index_type': config.get('faiss_index_type', DEFAULT_INDEX_TYPE),
+        'hnsw_m': config.get('faiss_hnsw_m', 32),
+        'hnsw_min_vectors': config.get('faiss_hnsw_min_vectors', _HNSW_MIN_VECTORS),
+        'ef_construction': config.get('faiss_ef_construction', 200),
+        'ef_search': config.get('faiss_ef_search', 128),
+        'ivf_nlist': config.get('faiss_ivf_nlist', 1024),
+        'nprobe': config.get('faiss_ivf_nprobe', 64),
+        'pq_m': config.get('faiss_pq_m', 16),
+    }
+
+
+def build_faiss_index(embeddings: np.ndarray, index_type: str = DEFAULT_INDEX_TYPE,
+                      params: Optional[Dict[str, Any]] = None):
+    """Build an inner-product FAISS index over L2-normalized embeddings"""
+    params = params or {}
+    embeddings = np.ascontiguousarray(embeddings, dtype='float32')
+    num_vectors, dimension = embeddings.shape
+    index_type = (index_type or DEFAULT_INDEX_TYPE).lower()
+
+    if index_type in _HNSW_FALLBACKS and num_vectors < params.get('hnsw_min_vectors', _HNSW_MIN_VECTORS):
+        logger.info(f"Only {num_vectors} vectors, using exact search instead of HNSW")
+        index_type = _HNSW_FALLBACKS[index_type]
+
+    if index_type == 'hnsw':
+        index = faiss.IndexHNSWFlat(dimension, params.get('hnsw_m', 32), faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = params.get('ef_construction', 200)
+        index.hnsw.efSearch = params.get('ef_search', 128)
+    elif index_type == 'sq8':
+        # 8-bit scalar quantization: 4x smaller than float32, scanned with int8 kernels
+        index = faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT)
+        index.train(embeddings)
+    elif index_type == 'sq_fp16':
+        # Half-precision storage: 2x smaller than float32 with practically no loss for unit vectors
+        index = faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_INNER_PRODUCT)
+        index.train(embeddings)
+    elif index_type in ('hnsw_sq8', 'hnsw_sq_fp16'):
+        qtype = faiss.ScalarQuantizer.QT_8bit if index_type == 'hnsw_sq8' else faiss.ScalarQuantizer.QT_fp16
+        index = faiss.IndexHNSWSQ(dimension, qtype, params.get('hnsw_m', 32), faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = params.get('ef_construction', 200)
+        index.hnsw.efSearch = params.get('ef_search', 128)
+        index.train(embeddings)
+    elif index_type == 'ivfflat':
+        # Full vectors in inverted lists: exact distances, only nprobe of the nlist lists scanned per query
+        nlist = max(1, min(params.get('ivf_nlist', 1024), num_vectors // 39))
+        quantizer = faiss.IndexFlatIP(dimension)
+        index = faiss.IndexIVFFlat(quantizer, dimension, nlist, faiss.METRIC_INNER_PRODUCT)
+        index.train(embeddings)
+        index.nprobe = min(params.get('nprobe', 64), nlist)
+    elif index_type == 'ivfpq':
+        pq_m = params.get('pq_m', 16)
+        if num_vectors < _PQ_MIN_TRAINING_VECTORS or dimension % pq_m != 0:
+            logger.warning(f"IVF-PQ needs >= {_PQ_MIN_TRAINING_VECTORS} vectors and a dimension divisible by "
+                           f"{pq_m} (got {num_vectors} x {dimension}), using a flat index instead")
+            index = faiss.IndexFlatIP(dimension)
+        else:
+            # Keep roughly 39+ training points per list, as FAISS recommends
+            nlist = max(1, min(params.get('ivf_nlist', 1024), num_vectors // 39))
+            quantizer = faiss.IndexFlatIP(dimension)
+            index = faiss.IndexIVFPQ(quantizer, dimension, nlist, pq_m, 8, faiss.METRIC_INNER_PRODUCT)
+            index.train(embeddings)
+            index.nprobe = min(params.get('nprobe', 64), nlist)
+    else:
+        if index_type != 'flat':
+            logger.warning(f"Unknown FAISS index type '{index_type}', using a flat index")
+        index = faiss.IndexFlatIP(dimension)
+
+    index.add(embeddings)
+    logger.info(f"Built FAISS {type(index).__name__} with {index.ntotal} vectors")
+    return index
+
+
+def chunk_index_metadata(chunk: Dict[str, Any]) -> Dict[str, Any]:
+    """Search metadata for one enhanced chunk (one row of a v2 index), with defaults for missing fields"""
+    return {
+        'title': chunk['title'],
+        'chunk_type': chunk['chunk_type'],
+        'chunk_classification': chunk.get('chunk_classification', 'unknown'),
+        'hierarchy_level': chunk['hierarchy_level'],
+        'font_size': chunk.get('font_size', 0),
+        'is_bold': chunk.get('is_bold', False),
+        'heading_level': chunk.get('heading_level', 0),
+        'page_start': chunk.get('page_start', 1),
+        'page_end': chunk.get('page_end', 1),
+        'page_count': chunk.get('page_count', 1),
+        'spans_multiple_pages': chunk.get('spans_multiple_pages', False),
+        'confidence': chunk.get('confidence', 0.5),
+        'has_procedures': chunk.get('has_procedures', False),
+        'is_heading_chunk': chunk.get('is_heading_chunk', False),
+        'exact_title_match': chunk.get('exact_title_match', ''),
+        'extraction_method': chunk.get('extraction_method', 'enhanced_page_aware')
+    }
+
+
+def read_faiss_index(path, mmap: bool = True):
+    """Load a FAISS index, memory-mapping its storage read-only when the index type supports it"""
+    if mmap:
+        try:
+            # Pages are faulted in on demand and shared through the OS page cache across workers
+            return faiss.read_index(str(path), faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError as e:
+            logger.debug(f"Memory-mapped load not supported for {path} ({e}), reading into memory")
+    return faiss.read_index(str(path))
+
+
+def configure_search_params(index, params: Optional[Dict[str, Any]] = None):
+    """Apply query-time settings (HNSW efSearch, IVF nprobe) to a loaded index"""
+    params = params or {}
+
+    if hasattr(index, 'hnsw'):
+        index.hnsw.efSearch = params.get('ef_search', 128)
+    if hasattr(index, 'nprobe') and hasattr(index, 'nlist'):
+        index.nprobe = min(params.get('nprobe', 64), index.nlist)
+
+    return index
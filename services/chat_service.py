@@ -1,4 +1,5 @@
 import time
+import asyncio
 from typing import List, Dict, Any, Optional, Tuple
 from loguru import logger
 from pathlib import Path
@@ -7,7 +8,7 @@ import re
 from models.chat import ChatSession, ChatMessage, MessageRole, Source, ChatResponse
 from storage.chat_storage import ChatStorage
 from services.rag_service import RAGService
-from services.ollama_service import generate_answer_with_ollama
+from services.ollama_service import generate_answer_with_ollama_async
 
 class ChatService:
     """Service for managing chat functionality with RAG integration"""
@@ -260,7 +261,7 @@ class ChatService:
     async def _get_rag_response(self, query: str, use_direct_results: bool = False) -> Tuple[str, float, List[Dict[str, Any]]]:
         """Get response from RAG system"""
         try:
-            retrieved_chunks = self.rag_service.search(query)
+            retrieved_chunks = await asyncio.to_thread(self.rag_service.search, query)
             
             if use_direct_results:
                 # Return direct results without LLM processing
@@ -320,7 +321,7 @@ class ChatService:
                     return content.strip(), 1.0, exact_matches
             
             # Standard RAG response generation
-            answer, confidence_score, validation_result = generate_answer_with_ollama(query, retrieved_chunks, self.rag_service.config)
+            answer, confidence_score, validation_result = await generate_answer_with_ollama_async(query, retrieved_chunks, self.rag_service.config)
             return answer, confidence_score, retrieved_chunks
             
         except Exception as e:
@@ -568,20 +569,20 @@ class ChatService:
         if not chunks:
             return f"No relevant information found for: '{query}'"
         
-        response = f"**Direct Search Results for: '{query}'**\n\n"
+        response_parts = [f"**Direct Search Results for: '{query}'**\n\n"]
         
         for i, chunk in enumerate(chunks, 1):
             metadata = chunk['metadata']
-            response += f"**Result {i}:**\n"
-            response += f"- **Title:** {metadata['section_title']}\n"
-            response += f"- **Document:** {metadata['filename']}\n"
-            response += f"- **Page:** {metadata['page_number']}\n"
-            response += f"- **Relevance Score:** {metadata['relevance_score']:.3f}\n"
-            response += f"- **Search Type:** {metadata.get('search_type', 'N/A')}\n"
-            response += f"- **Content:**\n{chunk['text']}\n\n"
-            response += "---\n\n"
+            response_parts.append(f"**Result {i}:**\n")
+            response_parts.append(f"- **Title:** {metadata['section_title']}\n")
+            response_parts.append(f"- **Document:** {metadata['filename']}\n")
+            response_parts.append(f"- **Page:** {metadata['page_number']}\n")
+            response_parts.append(f"- **Relevance Score:** {metadata['relevance_score']:.3f}\n")
+            response_parts.append(f"- **Search Type:** {metadata.get('search_type', 'N/A')}\n")
+            response_parts.append(f"- **Content:**\n{chunk['text']}\n\n")
+            response_parts.append("---\n\n")
         
-        return response
+        return ''.join(response_parts)
     
     def search_sessions(self, query: str) -> List[ChatSession]:
         """Search sessions by content"""
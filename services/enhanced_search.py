@@ -10,19 +10,58 @@ from pathlib import Path
 import numpy as np
 import json
 import re
-from collections import defaultdict
+import threading
+from collections import defaultdict, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 try:
-    from rank_bm25 import BM25Okapi
+    import bm25s
     from sentence_transformers import SentenceTransformer, CrossEncoder
     import faiss
 except ImportError as e:
     print(f"Missing required library: {e}")
-    print("Install with: pip install rank-bm25 sentence-transformers faiss-cpu")
+    print("Install with: pip install bm25s sentence-transformers faiss-cpu")
     raise
 
+# orjson parses the (large) index metadata files several times faster than json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from pdf_processing.vector_index import (
+    chunk_index_metadata, configure_search_params, index_params_from_config, read_faiss_index
+)
+
 logger = logging.getLogger(__name__)
 
+# Question-to-title transformation tables, compiled once
+_QUESTION_PREFIX_RE = re.compile(r'^(how to|how do i|what is|explain|describe)\s+', re.IGNORECASE)
+_HOW_TO_VERB_RE = re.compile(r'^how\s+(?:to|do\s+i)\s+(\w+)\s+(.+)', re.IGNORECASE)
+_VARIATION_PREFIX_RE = re.compile(r'^(how to|what is|explain|describe)\s+')
+
+# Word tokenizer shared by BM25 indexing, BM25 queries and keyword overlap (drops punctuation)
+_TOKEN_RE = re.compile(r'\w+')
+
+# Common verb transformations for procedural titles
+_PROCEDURAL_VERB_FORMS = {
+    'restart': ('restarting', 'restart'),
+    'start': ('starting', 'start'),
+    'stop': ('stopping', 'stop'),
+    'configure': ('configuring', 'configure'),
+    'install': ('installing', 'install'),
+    'setup': ('setting up', 'setup'),
+    'enable': ('enabling', 'enable'),
+    'disable': ('disabling', 'disable'),
+    'create': ('creating', 'create'),
+    'delete': ('deleting', 'delete'),
+    'update': ('updating', 'update'),
+    'upgrade': ('upgrading', 'upgrade'),
+    'deploy': ('deploying', 'deploy'),
+    'manage': ('managing', 'manage'),
+    'troubleshoot': ('troubleshooting', 'troubleshoot')
+}
+
 class EnhancedSearchEngine:
     """Enhanced search with exact title matching and complete response capability"""
     
@@ -51,11 +90,37 @@ class EnhancedSearchEngine:
         if config.get("enable_reranking", False):
             reranker_model = config.get("reranker_model", "cross-encoder/ms-marco-MiniLM-L-2-v2")
             logger.info(f"Loading lightweight reranker model: {reranker_model}")
-            self.reranker = CrossEncoder(reranker_model)
+            # Truncating query+chunk pairs bounds the cost of each forward pass (None keeps the model default)
+            self.reranker = CrossEncoder(reranker_model, max_length=config.get("reranker_max_length"))
             # Force CPU usage for reranker
             if hasattr(self.reranker.model, 'to'):
                 self.reranker.model.to('cpu')
         
+        # Query-time FAISS settings (HNSW efSearch / IVF nprobe)
+        self._faiss_search_params = index_params_from_config(config)
+        
+        # Move FAISS indexes to GPU when one is available (faiss-gpu builds only)
+        self._faiss_gpu_resources = None
+        self._query_encode_device = 'cpu'
+        self._use_faiss_gpu = (config.get("use_faiss_gpu", True)
+                               and hasattr(faiss, 'get_num_gpus') and faiss.get_num_gpus() > 0)
+        if self._use_faiss_gpu:
+            self._faiss_gpu_resources = faiss.StandardGpuResources()
+            logger.info(f"FAISS GPU search enabled ({faiss.get_num_gpus()} device(s))")
+            
+            # With a GPU present for search, encode queries there too instead of on the low-spec CPU path
+            import torch
+            if torch.cuda.is_available():
+                self._query_encode_device = 'cuda'
+        
+        # LRU of normalized query embeddings for repeat questions; a reindex builds a new engine, which starts empty
+        self._query_embedding_cache = OrderedDict()
+        self._query_embedding_cache_size = config.get("embedding_cache_size", 256)
+        self._query_embedding_lock = threading.Lock()
+        
+        # Worker thread for the dense half of hybrid search (encode + FAISS release the GIL)
+        self._search_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="faiss-search")
+        
         # Load enhanced document data
         self.documents = self._discover_enhanced_documents()
         self.bm25_indexes = {}
@@ -66,18 +131,36 @@ class EnhancedSearchEngine:
         # Initialize enhanced indexes
         self._load_enhanced_indexes()
 
+    def close(self):
+        """Stop the dense-search worker thread; queries already submitted still finish"""
+        self._search_executor.shutdown(wait=False)
+
     def _cpu_optimized_encode(self, sentences, batch_size=16, **kwargs):
         """CPU-optimized encoding with smaller batches for low-spec systems"""
         import torch
 
-        # Ensure we're using CPU
-        kwargs['device'] = 'cpu'
+        # CPU unless FAISS search runs on a GPU (see __init__)
+        kwargs['device'] = self._query_encode_device
         kwargs['batch_size'] = batch_size
 
         # Disable gradient computation for inference
         with torch.no_grad():
             return self._original_encode(sentences, **kwargs)
     
+    def _faiss_index_to_gpu(self, faiss_index):
+        """Copy a FAISS index to GPU(s) if GPU search is enabled, otherwise return it unchanged"""
+        if not self._use_faiss_gpu:
+            return faiss_index
+        
+        try:
+            if faiss.get_num_gpus() > 1:
+                return faiss.index_cpu_to_all_gpus(faiss_index)
+            # The shared resources object is kept on the engine so it outlives the GPU indexes
+            return faiss.index_cpu_to_gpu(self._faiss_gpu_resources, 0, faiss_index)
+        except Exception as e:
+            logger.warning(f"Could not move FAISS index to GPU, using CPU index: {e}")
+            return faiss_index
+    
     def _discover_enhanced_documents(self) -> List[str]:
         """Discover documents with enhanced chunks"""
         documents = []
@@ -118,25 +201,45 @@ class EnhancedSearchEngine:
                     continue
                 
                 # Load metadata
-                with open(metadata_path, 'r', encoding='utf-8') as f:
-                    metadata = json.load(f)
+                if orjson is not None:
+                    with open(metadata_path, 'rb') as f:
+                        metadata = orjson.loads(f.read())
+                else:
+                    with open(metadata_path, 'r', encoding='utf-8') as f:
+                        metadata = json.load(f)
                 
-                chunks = metadata.get('chunks', [])
-                chunk_metadata = metadata.get('metadata', [])
                 enhanced_chunks = metadata.get('enhanced_chunks', [])
+                chunks = metadata.get('chunks')
+                chunk_metadata = metadata.get('metadata')
+                
+                # Since enhancement_version 2.1, v2 files store each chunk only once, in enhanced_chunks
+                if chunks is None:
+                    chunks = [chunk['content'] for chunk in enhanced_chunks]
+                if chunk_metadata is None:
+                    chunk_metadata = [chunk_index_metadata(chunk) for chunk in enhanced_chunks]
                 
                 # Load FAISS index
                 if faiss_path.exists():
-                    faiss_index = faiss.read_index(str(faiss_path))
-                    self.faiss_indexes[doc_name] = faiss_index
+                    # GPU copies need the full index in host memory, so only memory-map for CPU search
+                    faiss_index = read_faiss_index(faiss_path, mmap=not self._use_faiss_gpu)
+                    configure_search_params(faiss_index, self._faiss_search_params)
+                    self.faiss_indexes[doc_name] = self._faiss_index_to_gpu(faiss_index)
                 
-                # Create BM25 index
-                tokenized_chunks = [chunk.lower().split() for chunk in chunks]
-                self.bm25_indexes[doc_name] = BM25Okapi(tokenized_chunks)
+                # Lowercase and tokenize each chunk once; BM25 and keyword sets share the tokens
+                chunks_lower = [chunk.lower() for chunk in chunks]
+                tokenized_chunks = [_TOKEN_RE.findall(chunk_lower) for chunk_lower in chunks_lower]
+                chunk_keywords = [set(tokens) for tokens in tokenized_chunks]
+                
+                # Create BM25 index (sparse score matrix, scored with vectorized lookups)
+                bm25 = bm25s.BM25()
+                bm25.index(tokenized_chunks, show_progress=False)
+                self.bm25_indexes[doc_name] = bm25
                 
                 # Store chunk data
                 self.document_chunks[doc_name] = {
                     'chunks': chunks,
+                    'chunks_lower': chunks_lower,
+                    'chunk_keywords': chunk_keywords,
                     'metadata': chunk_metadata,
                     'enhanced_chunks': enhanced_chunks,
                     'version': version
@@ -371,75 +474,25 @@ class EnhancedSearchEngine:
         query_clean = query.strip()
 
         # Remove common question words and transform to procedural form
-        basic_clean = re.sub(r'^(how to|how do i|what is|explain|describe)\s+', '', query_clean, flags=re.IGNORECASE)
+        basic_clean = _QUESTION_PREFIX_RE.sub('', query_clean)
         if basic_clean != query_clean:
             transforms.append(basic_clean)
 
         # Transform specific question patterns to procedural titles
-        # Pattern: "how to [verb] [object]" -> "[verb]ing [object]"
-        how_to_match = re.match(r'^how\s+to\s+(\w+)\s+(.+)', query_clean, re.IGNORECASE)
+        # Pattern: "how to [verb] [object]" / "how do i [verb] [object]" -> "[verb]ing [object]"
+        how_to_match = _HOW_TO_VERB_RE.match(query_clean)
         if how_to_match:
             verb, obj = how_to_match.groups()
-            verb_lower = verb.lower()
-
-            # Common verb transformations for procedural titles
-            verb_transforms = {
-                'restart': ['restarting', 'restart'],
-                'start': ['starting', 'start'],
-                'stop': ['stopping', 'stop'],
-                'configure': ['configuring', 'configure'],
-                'install': ['installing', 'install'],
-                'setup': ['setting up', 'setup'],
-                'enable': ['enabling', 'enable'],
-                'disable': ['disabling', 'disable'],
-                'create': ['creating', 'create'],
-                'delete': ['deleting', 'delete'],
-                'update': ['updating', 'update'],
-                'upgrade': ['upgrading', 'upgrade'],
-                'deploy': ['deploying', 'deploy'],
-                'manage': ['managing', 'manage'],
-                'troubleshoot': ['troubleshooting', 'troubleshoot']
-            }
-
-            if verb_lower in verb_transforms:
-                for verb_form in verb_transforms[verb_lower]:
-                    transforms.append(f"{verb_form} {obj}")
-                    transforms.append(f"{verb_form} the {obj}")
-
-        # Pattern: "how do i [verb] [object]" -> same transformation as above
-        how_do_match = re.match(r'^how\s+do\s+i\s+(\w+)\s+(.+)', query_clean, re.IGNORECASE)
-        if how_do_match:
-            verb, obj = how_do_match.groups()
-            verb_lower = verb.lower()
-
-            # Reuse the same verb_transforms dictionary
-            verb_transforms = {
-                'restart': ['restarting', 'restart'],
-                'start': ['starting', 'start'],
-                'stop': ['stopping', 'stop'],
-                'configure': ['configuring', 'configure'],
-                'install': ['installing', 'install'],
-                'setup': ['setting up', 'setup'],
-                'enable': ['enabling', 'enable'],
-                'disable': ['disabling', 'disable'],
-                'create': ['creating', 'create'],
-                'delete': ['deleting', 'delete'],
-                'update': ['updating', 'update'],
-                'upgrade': ['upgrading', 'upgrade'],
-                'deploy': ['deploying', 'deploy'],
-                'manage': ['managing', 'manage'],
-                'troubleshoot': ['troubleshooting', 'troubleshoot']
-            }
 
-            if verb_lower in verb_transforms:
-                for verb_form in verb_transforms[verb_lower]:
-                    transforms.append(f"{verb_form} {obj}")
-                    transforms.append(f"{verb_form} the {obj}")
+            for verb_form in _PROCEDURAL_VERB_FORMS.get(verb.lower(), ()):
+                transforms.append(f"{verb_form} {obj}")
+                transforms.append(f"{verb_form} the {obj}")
 
         # Specific transformations for common technical terms
+        query_lower = query_clean.lower()
         # SMI-S provider variations
-        if 'smi-s' in query_clean.lower() or 'smis' in query_clean.lower():
-            if 'restart' in query_clean.lower():
+        if 'smi-s' in query_lower or 'smis' in query_lower:
+            if 'restart' in query_lower:
                 transforms.extend([
                     'restarting the smi-s provider',
                     'restart the smi-s provider',
@@ -450,8 +503,8 @@ class EnhancedSearchEngine:
                 ])
 
         # Solution Pack variations
-        if 'solution' in query_clean.lower() and 'pack' in query_clean.lower():
-            if 'install' in query_clean.lower():
+        if 'solution' in query_lower and 'pack' in query_lower:
+            if 'install' in query_lower:
                 transforms.extend([
                     'installing solutionpacks',
                     'install solutionpacks',
@@ -461,8 +514,8 @@ class EnhancedSearchEngine:
                 ])
 
         # Frontend server variations
-        if 'frontend' in query_clean.lower() and 'server' in query_clean.lower():
-            if 'deploy' in query_clean.lower() or 'add' in query_clean.lower():
+        if 'frontend' in query_lower and 'server' in query_lower:
+            if 'deploy' in query_lower or 'add' in query_lower:
                 transforms.extend([
                     'deploying additional frontend servers',
                     'additional frontend server deployment',
@@ -471,7 +524,7 @@ class EnhancedSearchEngine:
                 ])
 
         # Database variations
-        if 'database' in query_clean.lower() and ('mysql' in query_clean.lower() or 'grant' in query_clean.lower()):
+        if 'database' in query_lower and ('mysql' in query_lower or 'grant' in query_lower):
             transforms.extend([
                 'adding mysql grants to the databases',
                 'mysql grants to databases',
@@ -570,7 +623,7 @@ class EnhancedSearchEngine:
             return None
         
         doc_data = self.document_chunks[doc_name]
-        query_keywords = set(re.findall(r'\w+', query.lower()))
+        query_keywords = set(_TOKEN_RE.findall(query.lower()))
         
         # For exact title matches with brief content, prefer using broader context
         # instead of replacing with potentially less relevant chunks
@@ -609,7 +662,7 @@ class EnhancedSearchEngine:
             # Special handling for security hardening queries
             if 'security' in query.lower() and 'hardening' in query.lower():
                 # Look for chunks that contain STIG, security guide references, or configuration details
-                chunk_lower = chunk_content.lower()
+                chunk_lower = doc_data['chunks_lower'][i]
                 security_indicators = [
                     'stig hardening rules', 'security hardening guide', 
                     'firewall settings', 'security configuration', 'hardening guide'
@@ -630,12 +683,12 @@ class EnhancedSearchEngine:
             if len(chunk_content) < 500:  # Skip short chunks
                 continue
             
-            chunk_lower = chunk_content.lower()
+            chunk_lower = doc_data['chunks_lower'][i]
             metadata = doc_data['metadata'][i] if i < len(doc_data['metadata']) else {}
             chunk_title = metadata.get('title', '').lower()
             
             # Check if chunk contains most query keywords
-            chunk_keywords = set(re.findall(r'\w+', chunk_lower))
+            chunk_keywords = doc_data['chunk_keywords'][i]
             keyword_overlap = len(query_keywords.intersection(chunk_keywords))
             
             # Be more strict about keyword matching - require higher overlap AND relevance indicators
@@ -742,7 +795,7 @@ class EnhancedSearchEngine:
                 continue
             
             # Only combine if it's truly related procedural content
-            chunk_lower = chunk_content.lower()
+            chunk_lower = doc_data['chunks_lower'][i]
             if any(phrase in chunk_lower for phrase in [
                 'steps', 'about this task', 'prerequisites', 'must be disabled',
                 'procedure', 'configuration steps'
@@ -760,7 +813,7 @@ class EnhancedSearchEngine:
             return None
         
         doc_data = self.document_chunks[doc_name]
-        query_keywords = set(re.findall(r'\w+', query.lower()))
+        query_keywords = set(_TOKEN_RE.findall(query.lower()))
         original_title = original_match['title'].lower()
         
         # For very brief content like "Security Hardening on SRM vApps", 
@@ -801,7 +854,7 @@ class EnhancedSearchEngine:
             
             metadata = doc_data['metadata'][i] if i < len(doc_data['metadata']) else {}
             chunk_title = metadata.get('title', '').lower()
-            chunk_lower = chunk_content.lower()
+            chunk_lower = doc_data['chunks_lower'][i]
             
             # Skip generic document overview/introduction sections unless very specific
             if any(generic in chunk_title for generic in [
@@ -873,19 +926,23 @@ class EnhancedSearchEngine:
 
     def _add_continuation_content(self, current_content: str, doc_name: str, chunk_idx: int, match: dict) -> str:
         """Add continuation content from the next chunk if it contains sequential steps"""
-        if not hasattr(self, '_all_chunks') or not self._all_chunks:
+        if doc_name not in self.document_chunks:
             return current_content
 
-        doc_chunks = self._all_chunks.get(doc_name, [])
+        # Neighbouring chunks are fetched by position at query time instead of
+        # storing overlapping copies in the index
+        doc_data = self.document_chunks[doc_name]
+        doc_chunks = doc_data['chunks']
+        doc_metadata = doc_data['metadata']
 
         # Look at the next few chunks for continuation
         for next_idx in range(chunk_idx + 1, min(chunk_idx + 3, len(doc_chunks))):
-            next_chunk = doc_chunks[next_idx]
-            next_content = next_chunk.get('content', '')
+            next_content = doc_chunks[next_idx]
 
             # Check if the next chunk contains what looks like continuation steps
             if self._looks_like_continuation(current_content, next_content):
-                logger.info(f"Found continuation in chunk {next_idx}: {next_chunk.get('title', 'Unknown')}")
+                next_title = doc_metadata[next_idx].get('title', 'Unknown') if next_idx < len(doc_metadata) else 'Unknown'
+                logger.info(f"Found continuation in chunk {next_idx}: {next_title}")
 
                 # Extract just the continuation part (avoid duplicating headers)
                 continuation_part = self._extract_continuation_steps(next_content)
@@ -1393,20 +1450,25 @@ class EnhancedSearchEngine:
             logger.info(f"Exact title match - returning complete content ({content_length} chars)")
             # Note: We keep the complete formatted_content without summarization
             
+            # Single copy of the stored metadata; stored values take precedence over the defaults below
+            source_metadata = match['metadata']
+            result_metadata = source_metadata.copy()
+            for key, value in (
+                ('title', match['title']),
+                ('document', match['document']),
+                ('chunk_type', match['chunk_type']),
+                ('match_type', 'exact_title_match'),
+                ('confidence', match['confidence_score']),
+                ('page', source_metadata.get('page_start', source_metadata.get('page', 1))),
+                ('is_complete_section', True),
+                ('query_matched', query),
+                ('source_chunk_index', match.get('chunk_index', 'unknown'))
+            ):
+                result_metadata.setdefault(key, value)
+            
             result = {
                 'text': formatted_content,
-                'metadata': {
-                    'title': match['title'],
-                    'document': match['document'],
-                    'chunk_type': match['chunk_type'],
-                    'match_type': 'exact_title_match',
-                    'confidence': match['confidence_score'],
-                    'page': match['metadata'].get('page_start', match['metadata'].get('page', 1)),
-                    'is_complete_section': True,
-                    'query_matched': query,
-                    'source_chunk_index': match.get('chunk_index', 'unknown'),
-                    **match['metadata']
-                },
+                'metadata': result_metadata,
                 'score': match['confidence_score'],
                 'document': match['document'],
                 'match_explanation': f"Exact title match for '{match['title']}'"
@@ -1435,35 +1497,35 @@ class EnhancedSearchEngine:
 
         all_results = []
 
-        # Generate query variations if enabled (disabled in low mode for performance)
-        query_variations = [query]
-        if self.config.get("enable_multi_query_generation", False):
-            query_variations.extend(self._generate_query_variations(query))
-
-        # Process documents sequentially for low-spec systems (avoid memory spikes)
-        max_concurrent = self.config.get("max_concurrent_searches", 1)
+        query_variations = self._query_variations(query)
 
-        for doc_name in self.documents:
-            if document_filter and doc_name != document_filter:
-                continue
-
-            if doc_name not in self.document_chunks:
-                continue
-
-            doc_results = []
+        doc_names = [doc_name for doc_name in self.documents
+                     if (not document_filter or doc_name == document_filter) and doc_name in self.document_chunks]
 
-            # Use reduced top_k for low-spec systems
-            search_top_k = min(self.config.get("top_k_bm25", 6), self.config.get("top_k_faiss", 6))
+        # Use reduced top_k for low-spec systems
+        search_top_k = min(self.config.get("top_k_bm25", 6), self.config.get("top_k_faiss", 6))
 
-            # BM25 search - more lightweight, prioritize this
-            for q_var in query_variations:
-                bm25_results = self._bm25_search(doc_name, q_var, search_top_k)
-                doc_results.extend(bm25_results)
+        # Dense and sparse retrieval are independent: run FAISS on the worker thread while BM25 scores here
+        faiss_future = None
+        run_dense = bool(self.faiss_indexes and doc_names)
+        if run_dense:
+            try:
+                faiss_future = self._search_executor.submit(self._dense_search_documents, doc_names, query_variations, search_top_k)
+            except RuntimeError:
+                # Engine was closed by a reindex while this query was in flight; search inline instead
+                pass
+
+        bm25_results = {doc_name: self._sparse_search_document(doc_name, query_variations, search_top_k)
+                        for doc_name in doc_names}
+        if faiss_future:
+            faiss_results = faiss_future.result()
+        elif run_dense:
+            faiss_results = self._dense_search_documents(doc_names, query_variations, search_top_k)
+        else:
+            faiss_results = {}
 
-            # FAISS search - more resource intensive
-            for q_var in query_variations:
-                faiss_results = self._faiss_search(doc_name, q_var, search_top_k)
-                doc_results.extend(faiss_results)
+        for doc_name in doc_names:
+            doc_results = bm25_results[doc_name] + faiss_results.get(doc_name, [])
 
             # Combine and deduplicate
             combined_results = self._combine_search_results(doc_results, doc_name)
@@ -1479,42 +1541,83 @@ class EnhancedSearchEngine:
         
         return all_results[:top_k]
     
+    def _sparse_search_document(self, doc_name: str, query_variations: List[str], top_k: int) -> List[Dict]:
+        """BM25 search for every query variation against one document"""
+        results = []
+        for q_var in query_variations:
+            results.extend(self._bm25_search(doc_name, q_var, top_k))
+        return results
+    
+    def _dense_search_documents(self, doc_names: List[str], query_variations: List[str], top_k: int) -> Dict[str, List[Dict]]:
+        """Encode the query variations once and run one batched FAISS search per document"""
+        query_embeddings = self._encode_queries(query_variations)
+        return {doc_name: self._faiss_search(doc_name, query_embeddings, top_k) for doc_name in doc_names}
+    
+    def _encode_queries(self, queries: List[str]) -> np.ndarray:
+        """Return normalized (Q, d) query embeddings, encoding only queries missing from the LRU cache"""
+        keys = [' '.join(query.lower().split()) for query in queries]
+        
+        with self._query_embedding_lock:
+            cached = {key: self._query_embedding_cache[key] for key in keys if key in self._query_embedding_cache}
+            for key in cached:
+                self._query_embedding_cache.move_to_end(key)
+        
+        # Normalized keys only address the cache; the model gets each key's first original query text
+        missing = {}
+        for key, query in zip(keys, queries):
+            if key not in cached:
+                missing.setdefault(key, query)
+        if missing:
+            new_embeddings = np.ascontiguousarray(self.embedding_model.encode(list(missing.values())),
+                                                  dtype='float32')
+            faiss.normalize_L2(new_embeddings)
+            with self._query_embedding_lock:
+                for key, embedding in zip(missing, new_embeddings):
+                    cached[key] = embedding
+                    if self._query_embedding_cache_size > 0:
+                        self._query_embedding_cache[key] = embedding
+                        self._query_embedding_cache.move_to_end(key)
+                while len(self._query_embedding_cache) > self._query_embedding_cache_size:
+                    self._query_embedding_cache.popitem(last=False)
+        
+        return np.stack([cached[key] for key in keys])
+    
     def _bm25_search(self, doc_name: str, query: str, top_k: int) -> List[Dict]:
         """BM25 search for a specific document"""
         if doc_name not in self.bm25_indexes:
             return []
         
         bm25 = self.bm25_indexes[doc_name]
-        query_tokens = query.lower().split()
+        query_tokens = _TOKEN_RE.findall(query.lower())
+        num_chunks = len(self.document_chunks[doc_name]['chunks'])
+        if not query_tokens or num_chunks == 0:
+            return []
         
-        scores = bm25.get_scores(query_tokens)
-        top_indices = np.argsort(scores)[::-1][:top_k]
+        # bm25s returns the sorted top-k directly (k may not exceed the corpus size)
+        top_indices, top_scores = bm25.retrieve([query_tokens], k=min(top_k, num_chunks), show_progress=False)
         
         results = []
-        for idx in top_indices:
-            if scores[idx] > 0:
+        for idx, score in zip(top_indices[0], top_scores[0]):
+            if score > 0:
                 results.append({
                     'document': doc_name,
                     'chunk_index': int(idx),
-                    'score': float(scores[idx]),
+                    'score': float(score),
                     'search_type': 'bm25'
                 })
         
         return results
     
-    def _faiss_search(self, doc_name: str, query: str, top_k: int) -> List[Dict]:
-        """FAISS search for a specific document"""
+    def _faiss_search(self, doc_name: str, query_embeddings: np.ndarray, top_k: int) -> List[Dict]:
+        """FAISS search for a specific document with a (Q, d) batch of normalized query embeddings"""
         if doc_name not in self.faiss_indexes:
             return []
         
         faiss_index = self.faiss_indexes[doc_name]
-        query_embedding = self.embedding_model.encode([query])
-        faiss.normalize_L2(query_embedding)
-        
-        scores, indices = faiss_index.search(query_embedding.astype('float32'), top_k)
+        scores, indices = faiss_index.search(query_embeddings, top_k)
         
         results = []
-        for score, idx in zip(scores[0], indices[0]):
+        for score, idx in zip(scores.ravel(), indices.ravel()):
             if idx != -1 and score > 0:
                 results.append({
                     'document': doc_name,
@@ -1528,25 +1631,24 @@ class EnhancedSearchEngine:
     def _combine_search_results(self, results: List[Dict], doc_name: str) -> List[Dict[str, Any]]:
         """Combine BM25 and FAISS results with score normalization"""
         
-        # Group by chunk index
-        chunk_scores = defaultdict(list)
+        # Deduplicate by chunk index in one pass, keeping the best score per search method
+        # (first-seen order, as before)
+        chunk_scores = {}
         for result in results:
-            chunk_scores[result['chunk_index']].append(result)
+            best = chunk_scores.setdefault(result['chunk_index'], {'bm25': 0, 'faiss': 0})
+            search_type = result['search_type']
+            if search_type in best and result['score'] > best[search_type]:
+                best[search_type] = result['score']
         
         combined_results = []
         doc_data = self.document_chunks[doc_name]
         
-        for chunk_idx, chunk_results in chunk_scores.items():
+        for chunk_idx, best in chunk_scores.items():
             if chunk_idx >= len(doc_data['chunks']):
                 continue
             
-            # Combine scores from different search methods
-            bm25_scores = [r['score'] for r in chunk_results if r['search_type'] == 'bm25']
-            faiss_scores = [r['score'] for r in chunk_results if r['search_type'] == 'faiss']
-            
-            # Normalize and combine
-            bm25_score = max(bm25_scores) if bm25_scores else 0
-            faiss_score = max(faiss_scores) if faiss_scores else 0
+            bm25_score = best['bm25']
+            faiss_score = best['faiss']
             
             # Weighted combination (can be configured)
             alpha = 0.5  # Weight for BM25 vs FAISS
@@ -1564,6 +1666,19 @@ class EnhancedSearchEngine:
         
         return combined_results
     
+    def _query_variations(self, query: str) -> List[str]:
+        """The query plus generated variations, if enabled (disabled in low mode for performance)"""
+        query_variations = [query]
+        if self.config.get("enable_multi_query_generation", False):
+            query_variations.extend(self._generate_query_variations(query))
+        return query_variations
+    
+    def prime_query_embeddings(self, queries: List[str]):
+        """Encode a batch of queries (and their variations) in one encoder call, filling the query embedding cache"""
+        all_variations = [q_var for query in queries for q_var in self._query_variations(query)]
+        if all_variations and self.faiss_indexes:
+            self._encode_queries(all_variations)
+    
     def _generate_query_variations(self, query: str) -> List[str]:
         """Generate query variations for better coverage"""
         variations = []
@@ -1574,12 +1689,13 @@ class EnhancedSearchEngine:
             variations.append(f"What is {query}")
         
         # Remove question words
-        clean_query = re.sub(r'^(how to|what is|explain|describe)\s+', '', query.lower())
-        if clean_query != query.lower():
+        query_lower = query.lower()
+        clean_query = _VARIATION_PREFIX_RE.sub('', query_lower)
+        if clean_query != query_lower:
             variations.append(clean_query)
         
         # Add related terms
-        if 'install' in query.lower():
+        if 'install' in query_lower:
             variations.append(query.replace('install', 'setup'))
             variations.append(query.replace('install', 'configure'))
         
@@ -1590,14 +1706,19 @@ class EnhancedSearchEngine:
         if not results or not self.reranker:
             return results
         
-        # Prepare pairs for reranking
-        pairs = [(query, result['text']) for result in results]
+        # Prepare pairs for reranking, longest first so each batch pads to similar lengths
+        order = sorted(range(len(results)), key=lambda i: len(results[i]['text']), reverse=True)
+        pairs = [(query, results[i]['text']) for i in order]
         
         # Get reranking scores
-        rerank_scores = self.reranker.predict(pairs)
+        rerank_scores = self.reranker.predict(
+            pairs,
+            batch_size=self.config.get("rerank_batch_size", 64),
+            show_progress_bar=False
+        )
         
-        # Update scores
-        for i, score in enumerate(rerank_scores):
+        # Update scores (map back through the length ordering)
+        for i, score in zip(order, rerank_scores):
             results[i]['rerank_score'] = float(score)
             results[i]['final_score'] = float(score)  # Use rerank score as final
         
@@ -1747,12 +1868,11 @@ class EnhancedSearchEngine:
             )
             precision_adjustments.extend(general_adjustments)
 
-            # Create enhanced result
-            enhanced_result = result.copy()
-            enhanced_result['enhanced_score'] = enhanced_score
-            enhanced_result['original_score'] = original_score
-            enhanced_result['precision_adjustments'] = precision_adjustments
-            enhanced_results.append(enhanced_result)
+            # Annotate in place - hybrid search results are freshly built per query
+            result['enhanced_score'] = enhanced_score
+            result['original_score'] = original_score
+            result['precision_adjustments'] = precision_adjustments
+            enhanced_results.append(result)
 
         # Sort by enhanced score
         enhanced_results.sort(key=lambda x: x.get('enhanced_score', 0), reverse=True)
@@ -1,11 +1,92 @@
+import re
 import ollama
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Tuple, AsyncIterator
 from loguru import logger
 
+# Complexity keywords compiled into one alternation so a query is scanned once
+_QUERY_COMPLEXITY_KEYWORDS = {
+    'simple': ['what is', 'which', 'where', 'when'],
+    'medium': ['how to', 'configure', 'setup'],
+    'complex': ['troubleshoot', 'optimize', 'best practices', 'maintenance', 'issue', 'error', 'loading', 'failed'],
+}
+_QUERY_COMPLEXITY_PATTERN = re.compile('|'.join(
+    f"(?P<{level}>{'|'.join(re.escape(word) for word in words)})"
+    for level, words in _QUERY_COMPLEXITY_KEYWORDS.items()
+))
+
+# Hallucination indicators, lowercased once instead of on every check
+_CRITICAL_UI_INDICATORS = [
+    (indicator, indicator.lower()) for indicator in [
+        "System Resources > Frontend Servers",
+        "Enable Frontend Server Tasks checkbox",
+        "Send Frontend Server Data option",
+        "log in to the HCL SRM console"
+    ]
+]
+_SUSPICIOUS_UI_TERMS = frozenset({"checkbox", "dropdown", "radiobutton"})
+
 def generate_answer_with_ollama(query: str, context_chunks: List[Dict[str, Any]], config: Dict[str, Any] = None) -> Tuple[str, float, Dict[str, Any]]:
     """
     Optimized answer generation with single-stage approach for better performance.
     """
+    ollama_model, is_low_mode, context_text = _prepare_generation_context(query, context_chunks, config)
+
+    # Single-stage generation for better performance
+    prompt = create_enhanced_prompt(query, context_text, "initial", is_low_mode=is_low_mode)
+    answer = generate_ollama_response(prompt, model=ollama_model)
+
+    validation_result = _validate_generated_answer(query, answer, context_chunks, is_low_mode)
+
+    answer, strict_prompt = _apply_strict_mode(query, answer, context_text, config, is_low_mode)
+    if strict_prompt:
+        answer = generate_ollama_response(strict_prompt, model=ollama_model)
+
+    confidence_score = _final_confidence_score(answer, validation_result, context_chunks, is_low_mode)
+
+    return answer, confidence_score, validation_result
+
+async def generate_answer_with_ollama_async(query: str, context_chunks: List[Dict[str, Any]], config: Dict[str, Any] = None) -> Tuple[str, float, Dict[str, Any]]:
+    """
+    Async variant of generate_answer_with_ollama that streams from Ollama without blocking the event loop.
+    """
+    ollama_model, is_low_mode, context_text = _prepare_generation_context(query, context_chunks, config)
+
+    prompt = create_enhanced_prompt(query, context_text, "initial", is_low_mode=is_low_mode)
+    answer = await generate_ollama_response_async(prompt, model=ollama_model)
+
+    validation_result = _validate_generated_answer(query, answer, context_chunks, is_low_mode)
+
+    answer, strict_prompt = _apply_strict_mode(query, answer, context_text, config, is_low_mode)
+    if strict_prompt:
+        answer = await generate_ollama_response_async(strict_prompt, model=ollama_model)
+
+    confidence_score = _final_confidence_score(answer, validation_result, context_chunks, is_low_mode)
+
+    return answer, confidence_score, validation_result
+
+async def stream_answer_with_ollama(query: str, context_chunks: List[Dict[str, Any]], config: Dict[str, Any] = None) -> AsyncIterator[str]:
+    """
+    Stream answer tokens as Ollama produces them. Strict-mode regeneration is not possible once
+    tokens are sent, so callers score the joined answer afterwards with score_streamed_answer.
+    """
+    ollama_model, is_low_mode, context_text = _prepare_generation_context(query, context_chunks, config)
+
+    prompt = create_enhanced_prompt(query, context_text, "initial", is_low_mode=is_low_mode)
+    async for token in stream_ollama_response(prompt, model=ollama_model):
+        yield token
+
+def score_streamed_answer(query: str, answer: str, context_chunks: List[Dict[str, Any]], config: Dict[str, Any] = None) -> Tuple[float, Dict[str, Any]]:
+    """Validate a fully streamed answer and compute its confidence score."""
+    current_mode = config.get("current_mode", "medium") if config else "medium"
+    is_low_mode = current_mode == "low"
+
+    validation_result = _validate_generated_answer(query, answer, context_chunks, is_low_mode)
+    confidence_score = _final_confidence_score(answer, validation_result, context_chunks, is_low_mode)
+
+    return confidence_score, validation_result
+
+def _prepare_generation_context(query: str, context_chunks: List[Dict[str, Any]], config: Dict[str, Any] = None) -> Tuple[str, bool, str]:
+    """Resolve model/mode settings and build the context text for generation."""
     # Get the model name from config
     ollama_model = config.get("ollama_model", "phi3:3.8b") if config else "phi3:3.8b"
 
@@ -31,7 +112,7 @@ def generate_answer_with_ollama(query: str, context_chunks: List[Dict[str, Any]]
     if is_low_mode:
         max_context_length = min(max_context_length, 1500)
     
-    context_text = ""
+    context_parts = []
     total_length = 0
 
     # Ultra-fast chunk processing for low mode
@@ -41,25 +122,25 @@ def generate_answer_with_ollama(query: str, context_chunks: List[Dict[str, Any]]
     for chunk in limited_chunks:
         chunk_text = chunk['text']
         if total_length + len(chunk_text) <= max_context_length:
-            context_text += chunk_text + "\n\n"
+            context_parts.append(chunk_text + "\n\n")
             total_length += len(chunk_text)
         else:
-            if not context_text:
-                context_text = chunk_text[:max_context_length] + "..."
+            if not context_parts:
+                context_parts.append(chunk_text[:max_context_length] + "...")
             break
-    
 
-    # Single-stage generation for better performance
-    prompt = create_enhanced_prompt(query, context_text, "initial", is_low_mode=is_low_mode)
-    answer = generate_ollama_response(prompt, model=ollama_model)
+    return ollama_model, is_low_mode, ''.join(context_parts)
 
+def _validate_generated_answer(query: str, answer: str, context_chunks: List[Dict[str, Any]], is_low_mode: bool) -> Dict[str, Any]:
+    """Validate the generated answer against the retrieved context."""
     # Ultra-fast validation for low mode
     if is_low_mode:
         # Skip validation entirely in low mode for maximum speed
-        validation_result = {"consistency_score": 0.8, "is_consistent": True}
-    else:
-        validation_result = validate_answer_consistency(query, answer, context_chunks)
-    
+        return {"consistency_score": 0.8, "is_consistent": True}
+    return validate_answer_consistency(query, answer, context_chunks)
+
+def _apply_strict_mode(query: str, answer: str, context_text: str, config: Dict[str, Any], is_low_mode: bool) -> Tuple[str, str]:
+    """Apply strict-mode hallucination handling; returns the answer and a prompt to regenerate with, if any."""
     # Check for hallucinated content if strict mode is enabled and not in low mode
     if config and config.get("strict_mode", False) and not is_low_mode:
         hallucination_check = detect_hallucination(answer, context_text)
@@ -70,36 +151,37 @@ def generate_answer_with_ollama(query: str, context_chunks: List[Dict[str, Any]]
             # For non-title matches, be very strict about PDF-only responses
             if hallucination_check.get("severity") in ["high", "medium"]:
                 logger.info("Strict mode: Replacing LLM response with PDF-only content")
-                answer = extract_safe_answer_from_context(query, context_text)
-            else:
-                # For low severity issues, try to generate a cleaner response
-                logger.info("Strict mode: Regenerating response with stricter instructions")
-                strict_prompt = create_strict_pdf_only_prompt(query, context_text)
-                answer = generate_ollama_response(strict_prompt, model=ollama_model)
-    
-    # Calculate confidence score - simplified for low mode
+                return extract_safe_answer_from_context(query, context_text), ""
+
+            # For low severity issues, try to generate a cleaner response
+            logger.info("Strict mode: Regenerating response with stricter instructions")
+            return answer, create_strict_pdf_only_prompt(query, context_text)
+
+    return answer, ""
+
+def _final_confidence_score(answer: str, validation_result: Dict[str, Any], context_chunks: List[Dict[str, Any]], is_low_mode: bool) -> float:
+    """Calculate confidence score - simplified for low mode."""
     if is_low_mode:
         # Fixed high confidence for low mode speed
-        confidence_score = 0.9
-    else:
-        confidence_score = calculate_confidence_score(answer, validation_result, context_chunks)
-
-    return answer, confidence_score, validation_result
+        return 0.9
+    return calculate_confidence_score(answer, validation_result, context_chunks)
 
 def analyze_query_complexity(query: str) -> str:
     """Analyze query complexity for dynamic context selection."""
     query_lower = query.lower()
     
-    # Simple queries
-    if any(word in query_lower for word in ['what is', 'which', 'where', 'when']):
-        return "simple"
+    # Collect every complexity level with a keyword hit in a single pass
+    matched_levels = set()
+    for match in _QUERY_COMPLEXITY_PATTERN.finditer(query_lower):
+        if match.lastgroup == "simple":
+            return "simple"
+        matched_levels.add(match.lastgroup)
     
-    # Medium complexity
-    if any(word in query_lower for word in ['how to', 'configure', 'setup']):
+    # Medium keywords take precedence over complex ones
+    if "medium" in matched_levels:
         return "medium"
     
-    # Complex queries
-    if any(word in query_lower for word in ['troubleshoot', 'optimize', 'best practices', 'maintenance', 'issue', 'error', 'loading', 'failed']):
+    if "complex" in matched_levels:
         return "complex"
     
     return "medium"
@@ -223,6 +305,40 @@ def generate_ollama_response(prompt: str, model: str = 'phi3:3.8b') -> str:
         logger.error(f"Error generating Ollama response: {e}")
         return f"I apologize, but I encountered an error while generating a response: {str(e)}"
 
+async def generate_ollama_response_async(prompt: str, model: str = 'phi3:3.8b') -> str:
+    """Generate response using Ollama's async client, joining the streamed tokens.
+    
+    Args:
+        prompt: The prompt to send to the model
+        model: The model name to use (from config.yaml)
+    """
+    return ''.join([token async for token in stream_ollama_response(prompt, model=model)])
+
+async def stream_ollama_response(prompt: str, model: str = 'phi3:3.8b') -> AsyncIterator[str]:
+    """Yield response tokens from Ollama's async client as they are produced.
+    
+    Args:
+        prompt: The prompt to send to the model
+        model: The model name to use (from config.yaml)
+    """
+    try:
+        client = ollama.AsyncClient()
+        stream = await client.chat(
+            model=model,
+            messages=[
+                {
+                    'role': 'user',
+                    'content': prompt,
+                },
+            ],
+            stream=True,
+        )
+        async for chunk in stream:
+            yield chunk['message']['content']
+    except Exception as e:
+        logger.error(f"Error generating Ollama response: {e}")
+        yield f"I apologize, but I encountered an error while generating a response: {str(e)}"
+
 def validate_answer_consistency(query: str, answer: str, context_chunks: List[Dict[str, Any]]) -> Dict[str, Any]:
     """Simplified validation for better performance."""
     try:
@@ -230,12 +346,14 @@ def validate_answer_consistency(query: str, answer: str, context_chunks: List[Di
         if not context_chunks:
             return {"consistency_score": 0.5, "is_consistent": True}
 
-        context_text = " ".join([chunk['text'] for chunk in context_chunks[:3]])  # Limit to first 3 chunks
-        context_words = set(context_text.lower().split())
         answer_words = set(answer.lower().split())
 
-        # Simple overlap calculation
-        overlap = len(context_words.intersection(answer_words))
+        # Simple overlap calculation - probe the small answer set with each chunk's
+        # tokens instead of materialising a joined context string and its word set
+        matched_words = set()
+        for chunk in context_chunks[:3]:  # Limit to first 3 chunks
+            matched_words.update(answer_words.intersection(chunk['text'].lower().split()))
+        overlap = len(matched_words)
         consistency_score = min(overlap / 50, 1.0) if overlap > 0 else 0.0  # Simplified scoring
 
         return {
@@ -268,14 +386,6 @@ def detect_hallucination(answer: str, context: str) -> Dict[str, Any]:
     Optimized hallucination detection for better performance.
     Simplified checks to reduce computational overhead.
     """
-    # Fast check for obvious hallucinations - only check for very specific indicators
-    critical_indicators = [
-        "System Resources > Frontend Servers",
-        "Enable Frontend Server Tasks checkbox",
-        "Send Frontend Server Data option",
-        "log in to the HCL SRM console"
-    ]
-
     issues = []
     has_hallucination = False
 
@@ -283,21 +393,20 @@ def detect_hallucination(answer: str, context: str) -> Dict[str, Any]:
     context_lower = context.lower()
 
     # Quick check for critical indicators (most common hallucinations)
-    for indicator in critical_indicators:
-        if indicator.lower() in answer_lower and indicator.lower() not in context_lower:
+    for indicator, indicator_lower in _CRITICAL_UI_INDICATORS:
+        if indicator_lower in answer_lower and indicator_lower not in context_lower:
             issues.append(f"Contains fabricated UI element: {indicator}")
             has_hallucination = True
 
-    # Simple word overlap check for basic validation
-    answer_words = set(answer_lower.split())
-    context_words = set(context_lower.split())
-
-    # Only check for very specific technical UI terms
-    suspicious_terms = {"checkbox", "dropdown", "radiobutton"}
-    for term in suspicious_terms:
-        if term in answer_words and term not in context_words:
-            issues.append(f"Contains UI control not in context: {term}")
-            has_hallucination = True
+    # Only check for very specific technical UI terms; the context word set is
+    # only built when the answer actually mentions one of them
+    answer_terms = _SUSPICIOUS_UI_TERMS.intersection(answer_lower.split())
+    if answer_terms:
+        context_words = set(context_lower.split())
+        for term in answer_terms:
+            if term not in context_words:
+                issues.append(f"Contains UI control not in context: {term}")
+                has_hallucination = True
 
     # Return simplified result for better performance
     return {
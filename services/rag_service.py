@@ -1,10 +1,12 @@
 from pathlib import Path
 from typing import List, Dict, Any
 import json
+import heapq
 import os
 import re
 from datetime import datetime
 from pdf_processing import PDFProcessor, PDFSearcher
+from pdf_processing.vector_index import index_params_from_config
 from services.enhanced_search import EnhancedSearchEngine
 from loguru import logger
 
@@ -19,13 +21,18 @@ class RAGService:
         # Get embedding model from config
         embedding_model = config.get("embedding_model", "all-MiniLM-L6-v2")
         
+        index_params = index_params_from_config(config)
         self.pdf_processor = PDFProcessor(
             output_dir=str(self.output_dir),
             index_dir=str(self.index_dir),
-            model_name=embedding_model
+            model_name=embedding_model,
+            index_type=index_params['index_type'],
+            index_params=index_params,
+            encode_batch_size=config.get("index_batch_size", 64)
         )
         self.pdf_searcher = None
         self.enhanced_search_engine = None
+        self._document_filenames = None  # document_id -> PDF filename, rebuilt after indexing
         self._load_searcher()
 
     def _load_searcher(self):
@@ -35,21 +42,32 @@ class RAGService:
                 embedding_model = self.config.get("embedding_model", "all-MiniLM-L6-v2")
                 
                 # Load legacy searcher for fallback
-                self.pdf_searcher = PDFSearcher(
+                pdf_searcher = PDFSearcher(
                     index_dir=str(self.index_dir),
                     extracted_docs_dir=str(self.output_dir),
-                    model_name=embedding_model
+                    model_name=embedding_model,
+                    index_params=index_params_from_config(self.config)
                 )
                 logger.info(f"PDFSearcher loaded successfully with model: {embedding_model}")
                 
                 # Load enhanced search engine
-                self.enhanced_search_engine = EnhancedSearchEngine(
+                enhanced_search_engine = EnhancedSearchEngine(
                     config=self.config,
                     index_dir=str(self.index_dir),
                     extracted_docs_dir=str(self.output_dir)
                 )
                 logger.info("Enhanced search engine loaded successfully.")
                 
+                # Swap in the fully loaded engines together so in-flight queries never see a mix
+                previous_engine = self.enhanced_search_engine
+                self.pdf_searcher = pdf_searcher
+                self.enhanced_search_engine = enhanced_search_engine
+                self._document_filenames = None
+                
+                # Release the replaced engine's worker thread
+                if previous_engine is not None:
+                    previous_engine.close()
+                
             except Exception as e:
                 logger.warning(f"Could not load search engines, indexes might be missing: {e}")
         else:
@@ -116,7 +134,8 @@ class RAGService:
         """Index documents with support for incremental processing"""
         if force_reindex:
             logger.info(f"Force reindexing all PDFs in {self.docs_path}")
-            results = self.pdf_processor.process_batch(str(self.docs_path))
+            results = self.pdf_processor.process_batch(str(self.docs_path),
+                                                       max_workers=self.config.get("index_workers"))
             # Update registry after force reindex (assuming batch processing handles registry updates internally)
             self._update_processed_files_registry()
         else:
@@ -133,23 +152,28 @@ class RAGService:
             results = []
             successfully_processed_files = []
 
+            jobs = []
             for filename in new_or_modified:
                 pdf_path = self.docs_path / filename
                 document_id = pdf_path.stem.replace(' ', '_').replace('-', '_')
+                jobs.append((str(pdf_path), document_id))
 
-                try:
-                    result = self.pdf_processor.process_document(str(pdf_path), document_id)
-                    results.append(result)
-                    successfully_processed_files.append(filename)
-                    logger.info(f"Successfully processed: {filename}")
-                except Exception as e:
-                    logger.error(f"Failed to process {filename}: {e}")
+            # PDFs are extracted in parallel worker processes (index_workers, default: CPU count)
+            processed = self.pdf_processor.process_documents(jobs, max_workers=self.config.get("index_workers"))
+
+            for filename, (_, document_id), result in zip(new_or_modified, jobs, processed):
+                if isinstance(result, Exception):
+                    logger.error(f"Failed to process {filename}: {result}")
                     results.append({
                         "document_id": document_id,
                         "filename": filename,
                         "status": "error",
-                        "error": str(e)
+                        "error": str(result)
                     })
+                else:
+                    results.append(result)
+                    successfully_processed_files.append(filename)
+                    logger.info(f"Successfully processed: {filename}")
 
             # Update the processed files registry only with successfully processed files
             if successfully_processed_files:
@@ -195,18 +219,27 @@ class RAGService:
 
     def get_pdf_filename_from_document_id(self, document_id: str) -> str:
         """Convert processed document ID back to original PDF filename"""
-        if not self.docs_path.exists():
-            return document_id
-        
-        # Try to find matching PDF file
-        for pdf_file in self.docs_path.glob("*.pdf"):
-            # Create document ID from filename (same logic as in processor)
-            created_doc_id = pdf_file.stem.replace(' ', '_').replace('-', '_')
-            if created_doc_id == document_id:
-                return pdf_file.name
+        # Build the lookup once per index load instead of globbing the docs folder per result
+        if self._document_filenames is None:
+            document_filenames = {}
+            if self.docs_path.exists():
+                for pdf_file in self.docs_path.glob("*.pdf"):
+                    # Create document ID from filename (same logic as in processor)
+                    created_doc_id = pdf_file.stem.replace(' ', '_').replace('-', '_')
+                    document_filenames.setdefault(created_doc_id, pdf_file.name)
+            self._document_filenames = document_filenames
         
         # Fallback: return the document_id if no match found
-        return document_id
+        return self._document_filenames.get(document_id, document_id)
+
+    def search_batch(self, queries: List[str], top_k: int = 5) -> List[List[Dict[str, Any]]]:
+        """Search several queries, encoding all of their embeddings in a single batch up front"""
+        if self.enhanced_search_engine:
+            try:
+                self.enhanced_search_engine.prime_query_embeddings(queries)
+            except Exception as e:
+                logger.warning(f"Batched query encoding failed, encoding per query: {e}")
+        return [self.search(query, top_k=top_k) for query in queries]
 
     def search(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
         # Try enhanced search first if available
@@ -534,8 +567,8 @@ class RAGService:
         
         # If no query, return most common/important titles
         if not query.strip():
-            # Sort by length (shorter titles first) and return top ones
-            sorted_titles_data = sorted(all_titles_data, key=lambda x: len(x["title"]))[:limit]
+            # Select the shortest titles without sorting the whole title map
+            sorted_titles_data = heapq.nsmallest(limit, all_titles_data, key=lambda x: len(x["title"]))
             suggestions = []
             for title_data in sorted_titles_data:
                 suggestion_data = {
@@ -591,12 +624,12 @@ class RAGService:
                     if word_overlap_score > 0.3:  # At least 30% word overlap
                         matching_titles.append((title_data, 30 + word_overlap_score * 20))
         
-        # Sort by relevance score and title length
-        matching_titles.sort(key=lambda x: (-x[1], len(x[0]["title"])))
+        # Top suggestions by relevance score and title length (partial selection, same order as a full sort)
+        top_matches = heapq.nsmallest(limit, matching_titles, key=lambda x: (-x[1], len(x[0]["title"])))
         
         # Return top suggestions with metadata
         suggestions = []
-        for title_data, score in matching_titles[:limit]:
+        for title_data, score in top_matches:
             suggestion_data = {
                 "title": title_data["title"],
                 "subtitle": title_data.get("subtitle", ""),
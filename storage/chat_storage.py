@@ -46,8 +46,9 @@ class ChatStorage:
         """Save a chat session to storage"""
         try:
             session_file = self.storage_dir / f"{session.session_id}.json"
+            # Serialize in pydantic-core directly instead of dumping to dicts and re-encoding with json
             with open(session_file, 'w', encoding='utf-8') as f:
-                json.dump(session.model_dump(), f, default=str, indent=2, ensure_ascii=False)
+                f.write(session.model_dump_json(indent=2))
             self.sessions[session.session_id] = session
             logger.debug(f"Saved session {session.session_id}")
         except Exception as e: